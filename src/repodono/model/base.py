@@ -1,4 +1,10 @@
+import asyncio
 from logging import getLogger
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from threading import Lock
+from time import monotonic
+from inspect import isawaitable
 from inspect import signature
 from functools import partial
 from operator import attrgetter
@@ -6,58 +12,122 @@ from pathlib import Path
 from types import FunctionType
 from types import MappingProxyType
 from ast import literal_eval
+from copy import deepcopy
 from collections import defaultdict
 from collections.abc import (
     Sequence,
     Mapping,
     MutableMapping,
+    Set,
 )
 
 from pkg_resources import EntryPoint
 from uritemplate import URITemplate
 
+from repodono.model.cache import LRUCache
+from repodono.model.negotiation import cached_parse_qvalues
+from repodono.model.negotiation import score_value
 from repodono.model.exceptions import (
     ExecutionNoResultError,
+    ExecutionTimeoutError,
     MappingReferenceError,
 )
 from repodono.model.proxbind import MappingBinderMeta
 
 logger = getLogger(__name__)
+_missing = object()
 
+# the keys that are reserved by the Execution for its locals.
+reserved_keys = frozenset([
+    '__route__', '__root__', '__path__', '__metadata_root__',
+    '__metadata_path__',
+])
+
+
+def _constant_resolver(value):
+    if not isinstance(value, (str, bytes, int, float, complex)):
+        # ensure every resolution produce an independent copy of any
+        # potentially mutable value.
+        return lambda vars_: deepcopy(value)
+    return lambda vars_: value
+
+
+def _error_resolver(msg):
+    def resolver(vars_):
+        raise MappingReferenceError(msg)
+    return resolver
+
+
+def _reference_resolver(value, consts):
+    if value in consts:
+        const = consts[value]
+        return lambda vars_: const
+
+    def resolver(vars_):
+        try:
+            return vars_[value]
+        except KeyError:
+            raise MappingReferenceError(
+                'reference to %r could not be resolved' % value)
+    return resolver
+
+
+def _attribute_resolver(value, consts):
+    getter = attrgetter(value)
+    if value.split('.', 1)[0] in consts:
+        overlay = AttributeFlatGroupedMapping([consts])
+        return lambda vars_: getter(overlay)
+    return getter
+
+
+def compile_vars_value(value, consts={}):
+    """
+    Compile the value into a resolver, which is a callable that accepts
+    a vars_ mapping and returns the value mapped from it, such that the
+    inspection of the value is only done once.  Any errors for invalid
+    values are deferred to when the resolver is called.
+
+    References to names found in the consts mapping are resolved from
+    there instead, and folded into the resolver.
+    """
 
-def map_vars_value(value, vars_):
     # these are assumed to be produced by the toml/json loads,
     # which should only produce instances of list/dict for the
     # structured data types.
     if isinstance(value, list):
-        return [map_vars_value(key, vars_) for key in value]
+        resolvers = [compile_vars_value(key, consts) for key in value]
+        return lambda vars_: [resolver(vars_) for resolver in resolvers]
     elif isinstance(value, dict):
-        return {
-            name: map_vars_value(key, vars_) for name, key in value.items()}
+        resolvers = [
+            (name, compile_vars_value(key, consts))
+            for name, key in value.items()
+        ]
+        return lambda vars_: {
+            name: resolver(vars_) for name, resolver in resolvers}
     elif isinstance(value, attrgetter):
-        return value(vars_)
-    elif isinstance(value, (int, bool)):
         return value
+    elif isinstance(value, (int, bool)):
+        return _constant_resolver(value)
     elif isinstance(value, str):
         if value[:1] in '\'\"':
             try:
-                return literal_eval(value)
+                return _constant_resolver(literal_eval(value))
             except Exception:
-                raise MappingReferenceError(
+                return _error_resolver(
                     "%r is an unsupported literal value" % value)
         elif '.' in value:
-            return attrgetter(value)(vars_)
+            return _attribute_resolver(value, consts)
         else:
-            try:
-                return vars_[value]
-            except KeyError:
-                raise MappingReferenceError(
-                    'reference to %r could not be resolved' % value)
+            return _reference_resolver(value, consts)
     else:
-        raise MappingReferenceError(
+        return _error_resolver(
             '%r is of an unsupported type for mapping' % value)
 
 
+def map_vars_value(value, vars_):
+    return compile_vars_value(value)(vars_)
+
+
 def structured_mapper(
         definition_pairs, input_mapping, _maps=NotImplemented, vars_=None):
     """
@@ -134,11 +204,19 @@ class FlatGroupedMapping(BaseMapping):
     value defined for that key in any of the inner mappings.
     """
 
+    # If true, the union of the keys from all the inner mappings will be
+    # cached after the first time it is needed, and only invalidated
+    # through assignments and deletions done through this mapping; so
+    # this should only be enabled for instances where the inner mappings
+    # do not change for their lifetime.
+    cache_keys = False
+
     def __init__(self, mappings):
         # FIXME implement error checks
         # TODO verify uniqueness??  How do we deal with the subclass of
         # this??
         self.__mappings = mappings
+        self.__keys = None
         super().__init__()
 
     def __get(self, key):
@@ -147,7 +225,12 @@ class FlatGroupedMapping(BaseMapping):
         """
 
         for mapping in self.__mappings:
-            if key in mapping:
+            if type(mapping) is dict:
+                # plain dicts can be trusted with a single lookup.
+                value = mapping.get(key, _missing)
+                if value is not _missing:
+                    return value
+            elif key in mapping:
                 try:
                     return mapping[key]
                 except KeyError:
@@ -168,6 +251,7 @@ class FlatGroupedMapping(BaseMapping):
             self.__get(key)
         except KeyError:
             super().__setitem__(key, value)
+            self.__keys = None
         else:
             raise KeyError("%r is read-only" % key)
 
@@ -176,15 +260,20 @@ class FlatGroupedMapping(BaseMapping):
             self.__get(key)
         except KeyError:
             super().__delitem__(key)
+            self.__keys = None
         else:
             raise KeyError("%r is read-only" % key)
 
     def __combined(self):
+        if self.__keys is not None:
+            return self.__keys
         results = set()
         for mapping in reversed(self.__mappings):
             results.update(mapping.keys())
         # cheat access to parent _map.
         results.update(self._BaseMapping__map.keys())
+        if self.cache_keys:
+            self.__keys = frozenset(results)
         return results
 
     def __iter__(self):
@@ -194,7 +283,12 @@ class FlatGroupedMapping(BaseMapping):
         return len(self.__combined())
 
     def __contains__(self, key):
-        return key in self.__combined()
+        # probe the mappings directly rather than building the combined
+        # set of keys.
+        for mapping in self.__mappings:
+            if key in mapping:
+                return True
+        return super().__contains__(key)
 
     def __repr__(self):
         return repr({k: self[k] for k in self.__combined()})
@@ -422,7 +516,7 @@ class BaseResourceDefinition(object):
     for all ResourceDefinition types.
     """
 
-    def __init__(self, name, call, kwargs, consts=None):
+    def __init__(self, name, call, kwargs, consts=None, volatile=False):
         """
         name
             The name that the resulting resource should be bound to
@@ -434,17 +528,88 @@ class BaseResourceDefinition(object):
             reference at call
         consts
             A mapping of constants that will override the mapping
+        volatile
+            If true, the resource will be instantiated at every access
+            through the execution locals, rather than only once for the
+            lifetime of that execution locals.
         """
 
         self.name = name
-        self.call = call
-        self.kwargs = kwargs
+        self.__kwargs = kwargs
         self.consts = {} if consts is None else consts
+        self.call = call
+        self.volatile = volatile
+
+    @property
+    def call(self):
+        return self.__call
+
+    @call.setter
+    def call(self, value):
+        self.__call = value
+        if callable(value) and not isinstance(value, attrgetter):
+            self.__call_resolver = lambda vars_: value
+        else:
+            self.__call_resolver = compile_vars_value(value)
+
+    @property
+    def kwargs(self):
+        return self.__kwargs
+
+    @kwargs.setter
+    def kwargs(self, value):
+        self.__kwargs = value
+        self.__compile()
+
+    @property
+    def consts(self):
+        return self.__consts
+
+    @consts.setter
+    def consts(self, value):
+        self.__consts = value
+        self.__compile()
+
+    def __compile(self):
+        # the resolvers are compiled upon assignment such that they are
+        # not recompiled for every call, with the consts folded in.
+        self.__resolvers = tuple(
+            (key, compile_vars_value(spec, self.__consts))
+            for key, spec in self.__kwargs.items()
+        )
 
     def __iter__(self):
         yield self.name
         yield self
 
+    def resolve_kwargs(self, vars_, omit_keys=()):
+        """
+        Return a new dict of the kwargs resolved from the vars_ mapping,
+        with the keys in omit_keys excluded.
+        """
+
+        if not isinstance(vars_, AttributeMapping):
+            # the resolvers for dotted names require attribute access.
+            vars_ = AttributeFlatGroupedMapping([vars_])
+        if not omit_keys:
+            return {key: resolver(vars_) for key, resolver in self.__resolvers}
+        if not isinstance(omit_keys, Set):
+            omit_keys = set(omit_keys)
+        return {
+            key: resolver(vars_)
+            for key, resolver in self.__resolvers if key not in omit_keys
+        }
+
+    def resolve(self, vars_, omit_keys=(), kwargs={}):
+        """
+        Instantiate the resource with the kwargs resolved from vars_;
+        the arguments are the same as the ones for __call__.
+        """
+
+        final_kwargs = self.resolve_kwargs(vars_, omit_keys)
+        final_kwargs.update(kwargs)
+        return self.__call_resolver(vars_)(**final_kwargs)
+
     def __call__(self, vars_, omit_keys=(), kwargs={}):
         """
         Prepares a callable object that can be invoked immediately
@@ -462,23 +627,14 @@ class BaseResourceDefinition(object):
             returned partial.
         """
 
-        if callable(self.call) and not isinstance(self.call, attrgetter):
-            call = self.call
-        else:
-            call = map_vars_value(self.call, vars_)
-
-        omit = set(omit_keys)
-
-        final_kwargs = map_vars_value({
-            k: v for k, v in self.kwargs.items() if k not in omit
-        }, AttributeFlatGroupedMapping([self.consts, vars_]))
+        final_kwargs = self.resolve_kwargs(vars_, omit_keys)
         final_kwargs.update(kwargs)
         # XXX this does NOT actually trigger the assignment to
         # vars_[self.name], as the current definition on how the
         # protocol works is not yet defined; it may be possible to
         # encapsulate the Environment in a submapping representing
         # some RuntimeEnvironment for the actual usage.
-        return partial(call, **final_kwargs)
+        return partial(self.__call_resolver(vars_), **final_kwargs)
 
 
 class BaseResourceDefinitionMapping(BasePreparedMapping):
@@ -490,7 +646,10 @@ class BaseResourceDefinitionMapping(BasePreparedMapping):
     will be assigned to.  Only one of __init__ or __call__ may be
     specified; The __init__ key must reference some valid entry point
     within the environment, while the __call__ key must reference an
-    existing value in the environment that will be invoked.
+    existing value in the environment that will be invoked.  The
+    optional __volatile__ key may be set to true for resources that must
+    be instantiated at every access, as otherwise they are only
+    instantiated once per execution.
 
     This base class makes no assumption as to how the assignment and/or
     retrieval should proceed.
@@ -499,30 +658,37 @@ class BaseResourceDefinitionMapping(BasePreparedMapping):
     class ResourceDefinition(BaseResourceDefinition):
 
         @classmethod
-        def from_call(cls, name, call, kwargs, consts=None):
+        def from_call(cls, name, call, kwargs, consts=None, volatile=False):
             # XXX call must be an indirect call that will load the
             # actual thing from vars then return call(**kwargs)
             # FIXME this is currently a placeholder
             return cls(
-                name=name, call=attrgetter(call), kwargs=kwargs, consts=consts)
+                name=name, call=attrgetter(call), kwargs=kwargs, consts=consts,
+                volatile=volatile,
+            )
 
         @classmethod
-        def from_entry_point(cls, name, init, kwargs, consts=None):
+        def from_entry_point(
+                cls, name, init, kwargs, consts=None, volatile=False):
             entry = EntryPoint.parse('target=' + init)
             call = entry.resolve()
-            return cls(name=name, call=call, kwargs=kwargs, consts=consts)
+            return cls(
+                name=name, call=call, kwargs=kwargs, consts=consts,
+                volatile=volatile,
+            )
 
         # TODO vars_ as an argument determine if sane?
 
     @classmethod
-    def create_resource_definition(cls, name, call, init, kwargs, consts=None):
+    def create_resource_definition(
+            cls, name, call, init, kwargs, consts=None, volatile=False):
         # a naive, generic creation method.
         if call is not None:
             return cls.ResourceDefinition.from_call(
-                name, call, kwargs, consts=consts)
+                name, call, kwargs, consts=consts, volatile=volatile)
         elif init is not None:
             return cls.ResourceDefinition.from_entry_point(
-                name, init, kwargs, consts=consts)
+                name, init, kwargs, consts=consts, volatile=volatile)
 
     @classmethod
     def prepare_from_item(cls, key, value):
@@ -539,10 +705,14 @@ class BaseResourceDefinitionMapping(BasePreparedMapping):
         # either of the callables.
         call = kwargs.pop('__call__', None)
         init = kwargs.pop('__init__', None)
+        # resources are instantiated once per execution, unless they
+        # are marked as volatile.
+        volatile = bool(kwargs.pop('__volatile__', False))
         consts = {
             '__route__': key,
         }
-        return cls.create_resource_definition(name, call, init, kwargs, consts)
+        return cls.create_resource_definition(
+            name, call, init, kwargs, consts, volatile=volatile)
 
     # one possible way for subclass to do a lazy load of the definition
     # during access is to override __getitem__ and apply self to kwargs
@@ -594,18 +764,20 @@ class BaseBucketDefinition(object):
 
     def match(self, mapping):
         """
-        Return a score if the provide keyword arguments are all found
-        inside the environment mapping.
+        Return a score between 0 and 1 for the provided mapping, which
+        is the product of the scores of the values for every key in the
+        environment mapping, as per score_value; a score of 0 means no
+        match.
         """
 
+        score = 1
         for key, value in self.environment.items():
-            if not (key in mapping and mapping[key] in value):
+            if key not in mapping:
                 return 0
-        else:
-            # XXX should return a score between 0 and 1.
-            return 1
-            # I am not even sure how or if multidimensional matching
-            # should even be handled?!
+            score *= score_value(mapping[key], value)
+            if not score:
+                return 0
+        return score
 
 
 class BaseBucketDefinitionMeta(MappingBinderMeta):
@@ -647,6 +819,113 @@ class BaseBucketDefinitionMapping(BasePreparedMapping):
     class BucketDefinition(BaseBucketDefinition):
         pass
 
+    # The maximum number of distinct incoming mappings that the resolved
+    # buckets will be memoized for, where 0 disables the memoization.
+    # As the incoming mappings are typically HTTP headers, only the keys
+    # inspected by the environment of any of the buckets are used to
+    # distinguish between them.  Note that the cache is only cleared
+    # through assignments and deletions done through this mapping, so
+    # the environment of the buckets must not be modified in place.
+    cache_size = 256
+
+    def __init__(self, *a, **kw):
+        self.cache = LRUCache(self.cache_size) if self.cache_size else None
+        self.__inspected_keys = None
+        self.__index = None
+        super().__init__(*a, **kw)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Clear the memoized results, the inspected keys and the index.
+        """
+
+        self.__inspected_keys = None
+        self.__index = None
+        if self.cache is not None:
+            self.cache.clear()
+
+    @property
+    def inspected_keys(self):
+        """
+        The sorted tuple of keys inspected by the environment of all the
+        buckets.
+        """
+
+        if self.__inspected_keys is None:
+            self.__inspected_keys = tuple(sorted({
+                key
+                for bucket in self.values()
+                for key in bucket.environment
+            }))
+        return self.__inspected_keys
+
+    @property
+    def index(self):
+        """
+        A 3-tuple of the inverted index of (key, value) to the set of
+        keys of the buckets that have the value listed for the key in
+        their environment, the mapping of each environment key to the
+        set of keys of the indexed buckets constrained by it, and the
+        set of keys of the buckets that could not be indexed as their
+        environment values are not collections of hashable values.
+        """
+
+        if self.__index is None:
+            index = {}
+            constrained = defaultdict(set)
+            unindexed = set()
+            for name, bucket in self.items():
+                entries = []
+                try:
+                    for key, values in bucket.environment.items():
+                        if isinstance(values, (str, bytes)) or (
+                                not isinstance(values, (Sequence, Set))):
+                            raise TypeError('values cannot be indexed')
+                        for value in values:
+                            hash(value)
+                            entries.append((key, value))
+                except TypeError:
+                    unindexed.add(name)
+                    continue
+                for entry in entries:
+                    index.setdefault(entry, set()).add(name)
+                for key in bucket.environment:
+                    constrained[key].add(name)
+            self.__index = (index, dict(constrained), frozenset(unindexed))
+        return self.__index
+
+    def candidates(self, mapping):
+        """
+        Return the set of keys of the buckets that may match the
+        mapping, as derived from the index.
+        """
+
+        index, constrained, unindexed = self.index
+        names = set(self.keys())
+        for key, names_constrained in constrained.items():
+            if key not in mapping:
+                names -= names_constrained
+                continue
+            value = mapping[key]
+            try:
+                matched = set(index.get((key, value), ()))
+            except TypeError:
+                matched = set()
+            if isinstance(value, str):
+                for item, quality in cached_parse_qvalues(value):
+                    if quality:
+                        matched.update(index.get((key, item), ()))
+            names -= names_constrained.difference(matched)
+        return names
+
     @classmethod
     def create_bucket_definition(cls, name, roots, environment):
         return cls.BucketDefinition(name, roots, environment)
@@ -668,9 +947,28 @@ class BaseBucketDefinitionMapping(BasePreparedMapping):
     # that provides a more robust mimetype parsing/model of it will be
     # beneficial.
 
-    # TODO figure out how and where to memoize the results to speed up
-    # future lookups, as the variety of incoming mappings shouldn't vary
-    # by much (as they are typically HTTP headers).
+    def resolve(self, mapping):
+        """
+        Return the list of 2-tuples of key and bucket that matched the
+        provided mapping, without going through the cache.
+        """
+
+        _ = self.default_key
+        # only the candidates from the index need to be matched, rather
+        # than every bucket against every key of the mapping.
+        scored = []
+        for key in self.candidates(mapping):
+            bucket = self[key]
+            score = bucket.match(mapping)
+            if score:
+                scored.append((
+                    bool(bucket.environment), score, key, bucket))
+        # the buckets that explicitly matched come before the ones that
+        # are unconstrained (which always have the full score), then by
+        # the highest score first, with the ties ordered by the key.
+        scored.sort(key=lambda item: item[:3], reverse=True)
+        key_buckets = [(key, bucket) for _c, _s, key, bucket in scored]
+        return key_buckets if key_buckets else [(_, self[_])]
 
     def __call__(self, mapping):
         """
@@ -678,11 +976,22 @@ class BaseBucketDefinitionMapping(BasePreparedMapping):
         implements a lookup function based on the provided mapping.
         """
 
-        _ = self.default_key
-        key_buckets = sorted((key_bucket for score, key_bucket in (
-            (bucket.match(mapping), (key, bucket))
-            for key, bucket in self.items()) if score), reverse=True)
-        return key_buckets if key_buckets else [(_, self[_])]
+        if self.cache is None:
+            return self.resolve(mapping)
+
+        projection = tuple(
+            mapping[key] if key in mapping else _missing
+            for key in self.inspected_keys
+        )
+        try:
+            result = self.cache.get(projection)
+        except TypeError:
+            # unhashable values cannot be memoized.
+            return self.resolve(mapping)
+        if result is None:
+            result = tuple(self.resolve(mapping))
+            self.cache[projection] = result
+        return list(result)
 
 
 class BucketDefinitionMapping(
@@ -771,7 +1080,8 @@ class BaseEndpointDefinition(object):
 
     def __init__(self, route, bucket_name, provider, root,
                  kwargs_mapping, environment,
-                 not_none=None, filename=None, bucket_mapping=None):
+                 not_none=None, filename=None, bucket_mapping=None,
+                 timeout=None):
         """
         Arguments:
 
@@ -821,6 +1131,13 @@ class BaseEndpointDefinition(object):
             An instance BucketDefinitionMapping - if supplied, it is
             used to define an alternative value to the `root` attribute,
             if the value supplied was None.
+        timeout
+            The maximum number of seconds that an execution of this
+            endpoint may take, including the resolution of resources,
+            before ExecutionTimeoutError is raised.  For the synchronous
+            executions the deadline is checked between the steps of the
+            execution on the calling thread, rather than interrupting
+            the steps themselves.
         """
 
         self.route = route
@@ -841,6 +1158,7 @@ class BaseEndpointDefinition(object):
         self.environment = environment
         self.not_none = not_none or []
         self.filename = filename
+        self.timeout = timeout
 
     def build_cache_path(self, mapping):
         # see the bounded version
@@ -967,12 +1285,14 @@ class BaseEndpointDefinitionMapping(BasePreparedMapping):
     @classmethod
     def create_endpoint_definition(
             cls, route, bucket_name, provider, root, kwargs_mapping,
-            environment, not_none=None, filename=None, bucket_mapping=None):
+            environment, not_none=None, filename=None, bucket_mapping=None,
+            timeout=None):
         return cls.EndpointDefinition(
             route, bucket_name, provider, root, kwargs_mapping, environment,
             not_none=not_none,
             filename=filename,
-            bucket_mapping=bucket_mapping
+            bucket_mapping=bucket_mapping,
+            timeout=timeout,
         )
 
     def prepare_from_item(self, key, value):
@@ -987,16 +1307,23 @@ class BaseEndpointDefinitionMapping(BasePreparedMapping):
         root = environment.pop('__root__', None)
         filename = environment.pop('__filename__', None)
         not_none = environment.pop('__notnone__', None)
+        timeout = environment.pop('__timeout__', None)
         route = key
 
         if not provider:
             raise ValueError('__provider__ must be defined')
 
+        if timeout is not None and (
+                isinstance(timeout, bool) or
+                not isinstance(timeout, (int, float)) or timeout <= 0):
+            raise ValueError('__timeout__ must be a positive number')
+
         return self.create_endpoint_definition(
             route, self.bucket_name, provider, root,
             kwargs_mapping, environment,
             not_none=not_none,
             filename=filename, bucket_mapping=self.bucket_mapping,
+            timeout=timeout,
         )
 
 
@@ -1270,6 +1597,160 @@ class CompiledRouteResourceDefinitionMapping(BaseMapping):
         super().__setitem__(*self.build_item(key, value))
 
 
+def iter_vars_references(value):
+    """
+    Yield the names referenced by the value, which is in the form as
+    accepted by compile_vars_value; for dotted names only the leading
+    name is produced.
+    """
+
+    if isinstance(value, list):
+        for item in value:
+            yield from iter_vars_references(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_vars_references(item)
+    elif isinstance(value, attrgetter):
+        # the attribute names are only available through this protocol.
+        for attr in value.__reduce__()[1]:
+            yield attr.split('.', 1)[0]
+    elif isinstance(value, str) and value[:1] not in '\'\"':
+        yield value.split('.', 1)[0]
+
+
+def _iter_remap_references(remap):
+    # the values of a remap for the MultiReMappingProxy are names that
+    # are looked up directly.
+    for value in remap.values():
+        if isinstance(value, Mapping):
+            yield from _iter_remap_references(value)
+        else:
+            yield value
+
+
+def _expand_remap_references(references, remap, resolved):
+    # follow the references that are not resolved directly (i.e. they
+    # will be looked up through the remap proxy) to their targets.
+    expanded = set()
+    pending = list(references)
+    while pending:
+        reference = pending.pop()
+        if reference in expanded:
+            continue
+        expanded.add(reference)
+        if reference not in resolved and reference in remap:
+            pending.extend(_iter_remap_references(
+                {reference: remap[reference]}))
+    return expanded
+
+
+def build_resource_graph(
+        resources, shadowed=(), overrides=None, remap=None):
+    """
+    Build the dependency graph for the resource definitions found in
+    the resources mapping, as a dict of the resource name to the set of
+    names of the resources it directly references.
+
+    Arguments:
+
+    resources
+        The mapping of resource definitions.
+    shadowed
+        The names that will be resolved before the resources, thus they
+        are neither part of the graph nor can they be depended upon.
+    overrides
+        An optional 2-tuple of resource name and a remap of its kwargs,
+        such as the kwargs mapping of an endpoint for its provider.
+    remap
+        An optional remap, such as the one from the localmap for the
+        route, where references to its keys that are not otherwise
+        resolved are followed through to the referenced names.
+    """
+
+    names = {
+        name for name in resources
+        if name not in shadowed and
+        isinstance(resources[name], BaseResourceDefinition)
+    }
+    override_name, kwargs_remap = overrides if overrides else (None, {})
+    graph = {}
+    for name in names:
+        definition = resources[name]
+        references = set(iter_vars_references(definition.call))
+        for key, spec in definition.kwargs.items():
+            if name == override_name and key in kwargs_remap:
+                continue
+            references.update(iter_vars_references(spec))
+        if name == override_name:
+            references.update(_iter_remap_references(kwargs_remap))
+        references.difference_update(definition.consts)
+        if remap:
+            references = _expand_remap_references(
+                references, remap, names.union(shadowed))
+        graph[name] = references & names
+    return graph
+
+
+def plan_resources(graph, targets):
+    """
+    Return a tuple of the names of the resources from the graph needed
+    for the resolution of the targets, ordered such that every resource
+    comes after all the resources it depends on.  A MappingReferenceError
+    will be raised should a cycle be found.
+    """
+
+    order = []
+    # a name maps to False while its dependencies are being visited.
+    visited = {}
+    for target in targets:
+        if target not in graph or target in visited:
+            continue
+        visited[target] = False
+        stack = [(target, iter(sorted(graph[target])))]
+        while stack:
+            name, dependencies = stack[-1]
+            for dependency in dependencies:
+                state = visited.get(dependency)
+                if state is None:
+                    visited[dependency] = False
+                    stack.append(
+                        (dependency, iter(sorted(graph[dependency]))))
+                    break
+                elif state is False:
+                    cycle = [name for name, _ in stack]
+                    cycle = cycle[cycle.index(dependency):] + [dependency]
+                    raise MappingReferenceError(
+                        'cyclic reference between resources: %s' % (
+                            ' -> '.join(cycle)))
+            else:
+                stack.pop()
+                visited[name] = True
+                order.append(name)
+    return tuple(order)
+
+
+def stage_resources(graph, plan):
+    """
+    Group the names from the plan, as produced by plan_resources, into a
+    tuple of stages, each being a tuple of names of resources that only
+    depend on resources in the earlier stages, such that the resources
+    within a stage may be resolved independently of each other.
+    """
+
+    levels = {}
+    stages = []
+    for name in plan:
+        level = max((
+            levels[dependency] + 1 for dependency in graph[name]
+            if dependency in levels
+        ), default=0)
+        levels[name] = level
+        if level == len(stages):
+            stages.append([])
+        stages[level].append(name)
+    return tuple(tuple(stage) for stage in stages)
+
+
 class ExecutionLocals(AttributeFlatGroupedMapping):
     """
     This should be constructed from a FlatGroupedMapping that has
@@ -1277,19 +1758,64 @@ class ExecutionLocals(AttributeFlatGroupedMapping):
     the current endpoint plus the extracted values from the route.  The
     __getitem__ method will automatically instantiate all resource
     definitions using values provided by itself.
+
+    Each resource definition will only be instantiated once for the
+    lifetime of an instance, such that the same resource referenced by
+    multiple other resources will be shared, unless the definition is
+    marked as volatile.
+
+    As the mappings provided are not expected to be modified for the
+    lifetime of an instance, the combined keys are cached.
+
+    A tracer may be provided, which will be called with the kind of the
+    operation ('resource') and the name of the resource, and it must
+    return a context manager that will wrap the instantiation of that
+    resource; see the repodono.model.profiling module.
     """
 
+    cache_keys = True
+
+    def __init__(self, mappings, tracer=None):
+        # the memo of resources instantiated from their definitions.
+        self.__resources = {}
+        self.__tracer = tracer
+        super().__init__(mappings)
+
     def process_resource_definition(self, resource_definition):
-        return resource_definition(vars_=self)()
+        return resource_definition.resolve(vars_=self)
+
+    def instantiate_resource(self, resource_definition):
+        if self.__tracer is None:
+            return self.process_resource_definition(resource_definition)
+        with self.__tracer('resource', resource_definition.name):
+            return self.process_resource_definition(resource_definition)
 
     def __getitem__(self, key):
         # TODO use some kind of threadlocal to track keys retrieved?
         # TODO static version?
         value = super().__getitem__(key)
-        if isinstance(value, BaseResourceDefinition):
-            return self.process_resource_definition(value)
-        else:
+        if not isinstance(value, BaseResourceDefinition):
             return value
+        if value.volatile:
+            return self.instantiate_resource(value)
+        try:
+            return self.__resources[value]
+        except KeyError:
+            result = self.instantiate_resource(value)
+            self.__resources[value] = result
+            return result
+
+    def update_resource(self, key, value):
+        """
+        Replace the memoized resource for the resource definition at key
+        with the provided value, e.g. the result of awaiting it.  Raises
+        KeyError if key does not reference a resource definition.
+        """
+
+        definition = super().__getitem__(key)
+        if not isinstance(definition, BaseResourceDefinition):
+            raise KeyError("%r is not a resource" % key)
+        self.__resources[definition] = value
 
 
 class EndpointExecutionLocals(ExecutionLocals):
@@ -1301,20 +1827,21 @@ class EndpointExecutionLocals(ExecutionLocals):
     # TODO consider replacing mappings with the arguments that go into
     # the original Execution object.
 
-    def __init__(self, mappings, endpoint, remap, default):
+    def __init__(self, mappings, endpoint, remap, default, tracer=None):
         self.__endpoint = endpoint
         self.__remap = remap
         super().__init__(mappings + [
             MultiReMappingProxy(self.__remap, self),
             default,
-        ])
+        ], tracer=tracer)
 
     def process_resource_definition(self, resource_definition):
         if resource_definition.name != self.__endpoint.name:
-            return resource_definition(vars_=self)()
-        return resource_definition(
+            return resource_definition.resolve(vars_=self)
+        return resource_definition.resolve(
             vars_=self, omit_keys=self.__endpoint.kwargs_mapping.keys(),
-        )(**MultiReMappingProxy(self.__endpoint.kwargs_mapping, self))
+            kwargs=MultiReMappingProxy(self.__endpoint.kwargs_mapping, self),
+        )
 
 
 class Execution(object):
@@ -1323,9 +1850,14 @@ class Execution(object):
     of an application.
     """
 
+    # A callable that produces a tracer for every instance, should one
+    # not be provided directly.
+    tracer_factory = None
+
     def __init__(
             self, endpoint, environment, default, resources, endpoint_mapping,
-            remap_mapping):
+            remap_mapping, flat_environment=None, flat_default=None,
+            resource_plan=None, tracer=None):
         """
         Arguments:
 
@@ -1348,6 +1880,23 @@ class Execution(object):
             additional mapping of values destructured from the url.
         remap_mapping
             additional remap
+
+        Optional Arguments:
+
+        flat_environment
+            a precomputed dict of the environment combined with the
+            environment of the endpoint, to be used in place of both.
+        flat_default
+            a precomputed dict of the default, to be used in its place.
+        resource_plan
+            a sequence of stages, each being a sequence of names of the
+            resources to be resolved before the provider, with every
+            resource only depending on the resources of the earlier
+            stages.
+        tracer
+            a tracer for the instantiation of the resources and the call
+            to the provider, as accepted by ExecutionLocals; if not
+            provided, one will be produced by tracer_factory, if set.
         """
 
         self.endpoint = endpoint
@@ -1355,6 +1904,13 @@ class Execution(object):
         self.default = default
         self.resources = resources
         self.endpoint_mapping = endpoint_mapping
+        self.resource_plan = () if resource_plan is None else resource_plan
+        if tracer is None and self.tracer_factory is not None:
+            tracer = self.tracer_factory()
+        self.tracer = tracer
+        # the monotonic time by which the execution must be completed,
+        # to be set by execute if the endpoint specified a timeout.
+        self.deadline = None
         # TODO figure out further reserved bindings and formalise
         # the system for this.
         # TODO make reserved mapping lazy.
@@ -1379,29 +1935,30 @@ class Execution(object):
             reserved['__metadata_path__'] = endpoint.build_cache_path(
                 endpoint_mapping, 'metadata_root')
 
-        self.locals = EndpointExecutionLocals([
-            reserved,
-            environment,
-            endpoint.environment,
+        # the immutable layers may be provided in a flattened form such
+        # that they are resolved with a single lookup.
+        if flat_environment is None:
+            environments = [environment, endpoint.environment]
+        else:
+            environments = [flat_environment]
+
+        self.locals = EndpointExecutionLocals([reserved] + environments + [
             resources,
             dict(endpoint_mapping),
-        ], endpoint, remap_mapping, self.default)
-        # import pdb;pdb.set_trace()
+        ], endpoint, remap_mapping,
+            self.default if flat_default is None else flat_default,
+            tracer=tracer)
 
-    def execute(self):
-        """
-        Executes the instructions encoded in the endpoint object.
-        """
+    def check_not_none(self, key, value):
+        if value is None:
+            # TODO should include the name of the endpoint set
+            raise ExecutionNoResultError(
+                "'%s' unexpectedly resolved to None for end point "
+                "in bucket '%s' with route '%s'" % (
+                    key, self.endpoint.bucket_name, self.endpoint.route)
+            )
 
-        for key in self.endpoint.not_none:
-            if self.locals[key] is None:
-                # TODO should include the name of the endpoint set
-                raise ExecutionNoResultError(
-                    "'%s' unexpectedly resolved to None for end point "
-                    "in bucket '%s' with route '%s'" % (
-                        key, self.endpoint.bucket_name, self.endpoint.route)
-                )
-        result = self.endpoint.provider(self.locals)
+    def check_result(self, result):
         if result is None:
             raise ExecutionNoResultError(
                 "provider '%s' referenced by end point in bucket '%s' "
@@ -1412,6 +1969,70 @@ class Execution(object):
             )
         return result
 
+    def timeout_error(self):
+        return ExecutionTimeoutError(
+            "execution of end point in bucket '%s' with route '%s' "
+            "exceeded the timeout of %s seconds" % (
+                self.endpoint.bucket_name, self.endpoint.route,
+                self.endpoint.timeout)
+        )
+
+    def check_deadline(self):
+        """
+        Raise ExecutionTimeoutError if the deadline has passed.
+        """
+
+        if self.deadline is not None and monotonic() >= self.deadline:
+            raise self.timeout_error()
+
+    def execute(self):
+        """
+        Executes the instructions encoded in the endpoint object.
+
+        If the endpoint specified a timeout, the deadline is enforced
+        cooperatively on the calling thread: ExecutionTimeoutError is
+        raised at the checks done before every resource in the plan and
+        before the provider, and also once the provider has returned
+        after the deadline.  As nothing is interrupted, a resource or a
+        provider that blocks will delay the error until it returns.
+        """
+
+        timeout = self.endpoint.timeout
+        if timeout is None:
+            return self.run()
+
+        self.deadline = monotonic() + timeout
+        result = self.run()
+        self.check_deadline()
+        return result
+
+    def run(self):
+        """
+        Run the steps for the execution of the endpoint, which will be
+        the checks for values that must not be None, the resolution of
+        the resources and then the provider.
+        """
+
+        for key in self.endpoint.not_none:
+            self.check_not_none(key, self.locals[key])
+        self.resolve_resources()
+        self.check_deadline()
+        if self.tracer is None:
+            return self.check_result(self.endpoint.provider(self.locals))
+        with self.tracer('provider', self.endpoint.name):
+            result = self.endpoint.provider(self.locals)
+        return self.check_result(result)
+
+    def resolve_resources(self):
+        """
+        Resolve the resources as per the resource plan.
+        """
+
+        for stage in self.resource_plan:
+            for name in stage:
+                self.check_deadline()
+                self.locals[name]
+
     def __call__(self):
         """
         Default implementation simply return the result from calling
@@ -1419,3 +2040,154 @@ class Execution(object):
         """
 
         return self.execute()
+
+
+class ConcurrentExecution(Execution):
+    """
+    An execution that resolves the resources within each stage of the
+    resource plan concurrently using an executor, such that the time
+    taken for I/O bound resources is reduced to the critical path.
+
+    Note that the resources resolved by the executor should not in turn
+    wait on executions that make use of the same executor.
+    """
+
+    # The executor for the resolution of the resources; if None, a
+    # ThreadPoolExecutor shared by all instances will be used.
+    executor = None
+
+    _shared_executor = None
+    _shared_executor_lock = Lock()
+
+    @classmethod
+    def get_executor(cls):
+        if cls.executor is not None:
+            return cls.executor
+        with ConcurrentExecution._shared_executor_lock:
+            if ConcurrentExecution._shared_executor is None:
+                ConcurrentExecution._shared_executor = ThreadPoolExecutor(
+                    thread_name_prefix='repodono.model.execution')
+        return ConcurrentExecution._shared_executor
+
+    def resolve_resources(self):
+        executor = None
+        for stage in self.resource_plan:
+            self.check_deadline()
+            if len(stage) == 1:
+                self.locals[stage[0]]
+                continue
+            if executor is None:
+                executor = self.get_executor()
+            futures = [
+                executor.submit(self.locals.__getitem__, name)
+                for name in stage
+            ]
+            # ensure all have completed before raising any exceptions.
+            wait(futures)
+            for future in futures:
+                future.result()
+
+
+class AsyncExecution(Execution):
+    """
+    An execution for use within asyncio, where execute and calling the
+    instance will produce a coroutine.  Resources and providers that
+    produce awaitables will be awaited, with the awaitables within each
+    stage of the resource plan awaited concurrently, and the results
+    will be the ones provided to the resources that depend on them.
+
+    Note that the instantiation of the resources themselves remain
+    synchronous; resources that are volatile will not be awaited unless
+    they are the provider.
+    """
+
+    async def resolve_awaitable(self, key):
+        """
+        Resolve the value at key from the locals, awaiting the value if
+        it is awaitable, and memoize the result if key is a resource.
+        """
+
+        value = self.locals[key]
+        if not isawaitable(value):
+            return value
+        value = await self.await_resource(key, value)
+        try:
+            self.locals.update_resource(key, value)
+        except KeyError:
+            pass
+        return value
+
+    async def await_resource(self, key, value):
+        """
+        Await the value produced for the resource at key, which will be
+        traced as the 'await' kind, if a tracer is available.
+        """
+
+        if self.tracer is None:
+            return await value
+        with self.tracer('await', key):
+            return await value
+
+    async def execute(self):
+        timeout = self.endpoint.timeout
+        if timeout is None:
+            return await self.run()
+
+        self.deadline = monotonic() + timeout
+        # asyncio.wait is used rather than asyncio.wait_for, such that a
+        # TimeoutError raised by the execution itself (e.g. from some
+        # I/O done by a resource) will not be mistaken for this.
+        task = asyncio.ensure_future(self.run())
+        try:
+            await asyncio.wait([task], timeout=timeout)
+        except BaseException:
+            task.cancel()
+            raise
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                # only the timeout is relevant for the abandoned task.
+                pass
+            raise self.timeout_error()
+        return task.result()
+
+    async def run(self):
+        for key in self.endpoint.not_none:
+            self.check_not_none(key, await self.resolve_awaitable(key))
+        await self.resolve_resources()
+        self.check_deadline()
+        if '.' in self.endpoint.name:
+            # the attributes are to be resolved from the awaited value.
+            await self.resolve_awaitable(self.endpoint.name.split('.', 1)[0])
+        if self.tracer is None:
+            result = await self.call_provider()
+        else:
+            with self.tracer('provider', self.endpoint.name):
+                result = await self.call_provider()
+        return self.check_result(result)
+
+    async def call_provider(self):
+        result = self.endpoint.provider(self.locals)
+        if isawaitable(result):
+            result = await result
+        return result
+
+    async def resolve_resources(self):
+        for stage in self.resource_plan:
+            self.check_deadline()
+            values = [(name, self.locals[name]) for name in stage]
+            awaitables = [
+                (name, value) for name, value in values if isawaitable(value)]
+            if not awaitables:
+                continue
+            results = await asyncio.gather(*(
+                self.await_resource(name, value)
+                for name, value in awaitables
+            ))
+            for (name, value), result in zip(awaitables, results):
+                self.locals.update_resource(name, result)
+
+    async def __call__(self):
+        return await self.execute()
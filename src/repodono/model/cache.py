@@ -0,0 +1,92 @@
+"""
+Caching utilities for the repodono.model framework.
+"""
+
+from collections import namedtuple
+from collections import OrderedDict
+from threading import Lock
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LRUCache(object):
+    """
+    A bounded, thread-safe cache that evicts the least recently used
+    item once the number of items exceeds the maximum size.
+    """
+
+    def __init__(self, maxsize=1024, track_stats=True):
+        """
+        Arguments:
+
+        maxsize
+            The maximum number of items to be kept by the cache.
+        track_stats
+            Whether the hits and misses should be tracked.
+        """
+
+        if maxsize < 0:
+            raise ValueError("'maxsize' must not be negative")
+        self.maxsize = maxsize
+        self.track_stats = track_stats
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value for key, marking it as the most recently used,
+        or default if the key is not cached.
+        """
+
+        with self.__lock:
+            try:
+                value = self.__data[key]
+            except KeyError:
+                if self.track_stats:
+                    self.misses += 1
+                return default
+            self.__data.move_to_end(key)
+            if self.track_stats:
+                self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+
+    def __contains__(self, key):
+        # does not affect the order nor the statistics.
+        return key in self.__data
+
+    def __len__(self):
+        return len(self.__data)
+
+    def evict(self, key):
+        """
+        Remove the item for key from the cache, if present.
+        """
+
+        with self.__lock:
+            self.__data.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all items from the cache and reset the statistics.
+        """
+
+        with self.__lock:
+            self.__data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Return the statistics of the cache as a CacheInfo.
+        """
+
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
@@ -4,10 +4,15 @@ The confiration classes for the repodono framework.
 
 import logging
 import toml
+from collections import namedtuple
 
 from repodono.model.base import (
     BaseMapping,
     Execution,
+    build_resource_graph,
+    plan_resources,
+    reserved_keys,
+    stage_resources,
     RouteTrieMapping,
     CompiledRouteResourceDefinitionMapping,
 
@@ -16,6 +21,7 @@ from repodono.model.base import (
     BoundedEndpointDefinition,
     BoundedEndpointDefinitionMapping,
 )
+from repodono.model.exceptions import MappingReferenceError
 from repodono.model.mappings import (
     Environment,
     Metadata,
@@ -28,6 +34,50 @@ from repodono.model.routing import URITemplateRouter
 
 logger = logging.getLogger(__name__)
 
+# The compiled form of an endpoint, along with what its executions need.
+EndpointPlan = namedtuple('EndpointPlan', [
+    'endpoint', 'flat_environment', 'resource_plan'])
+
+
+class RoutePlan(object):
+    """
+    The precompiled plan for a route, holding everything that is needed
+    to create the executions for the route.
+    """
+
+    def __init__(self, route, resources, remap, endpoints):
+        """
+        Arguments:
+
+        route
+            The route.
+        resources
+            The compiled resources for the route.
+        remap
+            The remap mapping for the route.
+        endpoints
+            A mapping of the names of the buckets that defined an
+            endpoint for this route to the EndpointPlan of it.
+        """
+
+        self.route = route
+        self.resources = resources
+        self.remap = remap
+        self.endpoints = endpoints
+
+    def resolve(self, buckets):
+        """
+        Return the EndpointPlan for the first of the provided 2-tuples of
+        bucket name and bucket that defined an endpoint for this route.
+        """
+
+        for bucket_key, bucket in buckets:
+            endpoint_plan = self.endpoints.get(bucket_key)
+            if endpoint_plan is not None:
+                return endpoint_plan
+        raise KeyError(
+            "route '%s' cannot be resolved from endpoints" % self.route)
+
 
 # Perhaps this could be another class in the base module?
 class BaseConfiguration(BaseMapping):
@@ -57,7 +107,10 @@ class Configuration(BaseConfiguration):
     framework.
     """
 
-    def __init__(self, config_mapping, execution_class=Execution):
+    def __init__(
+            self, config_mapping, execution_class=Execution,
+            router_class=URITemplateRouter, router_cache_dir=None,
+            router_options=None):
         super().__init__(config_mapping)
         self.environment = Environment(self)
         self.metadata = Metadata(self)
@@ -67,6 +120,13 @@ class Configuration(BaseConfiguration):
         self.resource = Resource(self)
         self.endpoint = self.bucket.Endpoint(self)
         self.execution_class = execution_class
+        self.router_class = router_class
+        # if provided, the state of the compiled router will be persisted
+        # into this directory and restored for subsequent instances.
+        self.router_cache_dir = router_cache_dir
+        # additional keyword arguments for the construction of the
+        # router, e.g. cache or lazy.
+        self.router_options = {} if router_options is None else router_options
         self.compile()
 
     @property
@@ -92,7 +152,13 @@ class Configuration(BaseConfiguration):
         self.compiled_route_resources = CompiledRouteResourceDefinitionMapping(
             rtres)
         # just use the router to "sort" the endpoint keys for now.
-        self.router = URITemplateRouter.from_strings(self._endpoint_keys)
+        if self.router_cache_dir is None:
+            self.router = self.router_class.from_strings(
+                self._endpoint_keys, **self.router_options)
+        else:
+            self.router = self.router_class.from_strings_cached(
+                self._endpoint_keys, self.router_cache_dir,
+                **self.router_options)
 
         # Since it's too painful to bind mapping of one type to another
         # based on the same proxybind framework because of how types
@@ -122,6 +188,92 @@ class Configuration(BaseConfiguration):
             for k, edsmap in self.endpoint.items()
         }
 
+        # The endpoints for every route, keyed by the name of the bucket
+        # that defined them, such that the endpoint for the resolved
+        # buckets may be looked up directly by the route.
+        self.route_endpoints = {}
+        for bucket_name, edmap in self.endpoint.items():
+            for route, endpoint in edmap.items():
+                self.route_endpoints.setdefault(route, {})[
+                    bucket_name] = endpoint
+
+        # The environment, the default and the environment for each of
+        # the endpoints are not modified after compilation, so they are
+        # flattened into dicts here such that only a single lookup is
+        # needed to resolve values from them for the executions.
+        self.flat_default = dict(self.default)
+        flat_environment = dict(self.environment)
+        self.flat_environments = {}
+        for bucket_name, edmap in self.endpoint.items():
+            for route, endpoint in edmap.items():
+                environment = dict(endpoint.environment)
+                environment.update(flat_environment)
+                self.flat_environments[(bucket_name, route)] = environment
+
+        # The dependencies between the resources for each endpoint are
+        # resolved here such that cyclic references are reported early,
+        # and that the resources needed by the provider may be resolved
+        # in order by the execution.
+        self.resource_plans = {}
+        for (bucket_name, route), environment in (
+                self.flat_environments.items()):
+            self.resource_plans[(bucket_name, route)] = self.plan_endpoint(
+                self.endpoint[bucket_name][route], environment)
+
+        # Finally, gather all of the above for every route, such that
+        # the creation of the executions for a route will not need to
+        # repeat any of the lookups.
+        self.route_plans = {
+            route: RoutePlan(
+                route, self.compiled_route_resources[route],
+                # the remapping is only needed if localmap has an entry
+                # defined for this route.
+                self.localmap[route].remap if route in self.localmap else {},
+                {
+                    bucket_name: EndpointPlan(
+                        endpoint,
+                        self.flat_environments[(bucket_name, route)],
+                        self.resource_plans[(bucket_name, route)],
+                    )
+                    for bucket_name, endpoint in endpoints.items()
+                },
+            )
+            for route, endpoints in self.route_endpoints.items()
+        }
+
+    def plan_endpoint(self, endpoint, environment):
+        """
+        Return the resource plan for the endpoint, with the environment
+        being the flattened environment for the endpoint.  The plan is a
+        tuple of stages of the names of resources that may be resolved
+        independently of each other.
+        """
+
+        resources = self.compiled_route_resources[endpoint.route]
+        provider = endpoint.name.split('.', 1)[0]
+        graph = build_resource_graph(
+            resources, shadowed=reserved_keys.union(environment),
+            # the kwargs mapping only apply to a provider that is named
+            # by the endpoint exactly.
+            overrides=(endpoint.name, endpoint.kwargs_mapping),
+            remap=(
+                self.localmap[endpoint.route].remap
+                if endpoint.route in self.localmap else None),
+        )
+        try:
+            plan_resources(graph, sorted(graph))
+        except MappingReferenceError as e:
+            raise MappingReferenceError(
+                "%s; for end point in bucket '%s' with route '%s'" % (
+                    e.args[0], endpoint.bucket_name, endpoint.route)
+            ) from None
+        stages = stage_resources(graph, plan_resources(
+            graph, sorted(graph.get(provider, ()))))
+        return tuple(filter(None, (
+            tuple(name for name in stage if not resources[name].volatile)
+            for stage in stages
+        )))
+
     def request_execution(
             self, route, mapping, bucket_mapping={}, execution_class=None):
         """
@@ -143,9 +295,6 @@ class Configuration(BaseConfiguration):
             the class that implements the execution
         """
 
-        if execution_class is None:
-            execution_class = self.execution_class
-
         # resolve the target bucket with the bucket mapping and the
         # bucket config mapping.
 
@@ -157,33 +306,74 @@ class Configuration(BaseConfiguration):
 
         # This currently raises a simple KeyError if endpoint cannot be
         # resolved
-        endpoint = self.route_bucket_endpoint_resolver(route, bucket_mapping)
-        resources = self.compiled_route_resources[route]
-        # the remapping is only needed if localmap has an entry defined
-        # for this route.
-        remap_mapping = (
-            self.localmap[route].remap if route in self.localmap else {})
+        route_plan = self.route_plans.get(route)
+        if route_plan is None:
+            raise KeyError(
+                "route '%s' cannot be resolved from endpoints" % route)
+        return self.plan_execution(
+            route_plan, mapping, bucket_mapping, execution_class)
+
+    def plan_execution(
+            self, route_plan, mapping, bucket_mapping={},
+            execution_class=None):
+        """
+        Generates an execution object from a RoutePlan, with the other
+        arguments as per request_execution.
+        """
+
+        if execution_class is None:
+            execution_class = self.execution_class
+        endpoint_plan = route_plan.resolve(self.bucket(bucket_mapping))
         return execution_class(
-            endpoint, self.environment, self.default, resources, mapping,
-            remap_mapping,
+            endpoint_plan.endpoint, self.environment, self.default,
+            route_plan.resources, mapping, route_plan.remap,
+            flat_environment=endpoint_plan.flat_environment,
+            flat_default=self.flat_default,
+            resource_plan=endpoint_plan.resource_plan,
         )
 
+    def dispatch(self, uri, bucket_mapping={}, execution_class=None):
+        """
+        Generates an execution object for the uri, which is routed
+        through the router, such that the route and the mapping do not
+        need to be produced externally.
+
+        Arguments:
+
+        uri
+            the uri to dispatch
+
+        Optional Argument:
+
+        bucket_mapping
+            the mapping for the values for bucket resolution.
+        execution_class
+            the class that implements the execution
+
+        Raises KeyError if the uri cannot be routed, or if the endpoint
+        cannot be resolved for the route.
+        """
+
+        result = self.router(uri)
+        if result is None:
+            raise KeyError("uri '%s' cannot be routed" % uri)
+        route, mapping = result
+        return self.plan_execution(
+            self.route_plans[route], mapping, bucket_mapping, execution_class)
+
     def route_bucket_endpoint_resolver(self, route, bucket_mapping={}):
         """
         Resolves the bucket based on the incoming keyword arguments
         passed to this method.
         """
 
-        # TODO this may be a useful method to memoize
-
-        for bucket_key, bucket in self.bucket(bucket_mapping):
-            endpoint = self.endpoint[bucket_key].get(route, NotImplemented)
-            if endpoint is NotImplemented:
-                continue
-            return endpoint
-        else:
+        # the resolution of the buckets is memoized by the bucket
+        # mapping itself.
+        route_plan = self.route_plans.get(route)
+        if route_plan is None:
             raise KeyError(
                 "route '%s' cannot be resolved from endpoints" % route)
+        return route_plan.resolve(self.bucket(bucket_mapping)).endpoint
 
     def endpoint_callable_factory(self):
         """
@@ -4,6 +4,7 @@ from pathlib import Path
 from mimetypes import MimeTypes
 from requests.structures import CaseInsensitiveDict
 
+from repodono.model.base import AsyncExecution
 from repodono.model.base import Execution
 
 mimetypes = MimeTypes()
@@ -100,7 +101,12 @@ class HttpExecution(Execution):
         has not already done so.
         """
 
-        result = self.execute()
+        return self.to_response(self.execute())
+
+    def to_response(self, result):
+        """
+        Reprocess the result into an instance of Response.
+        """
 
         if isinstance(result, Response):
             # It may be possible for results be already wrapped, so in
@@ -130,3 +136,13 @@ class HttpExecution(Execution):
             )
 
         raise ValueError('unsupported execution result')
+
+
+class AsyncHttpExecution(AsyncExecution, HttpExecution):
+    """
+    The asyncio version of the HttpExecution, where calling an instance
+    will produce a coroutine that returns the Response.
+    """
+
+    async def __call__(self):
+        return self.to_response(await self.execute())
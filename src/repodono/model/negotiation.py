@@ -0,0 +1,77 @@
+"""
+Helpers for the negotiation of the buckets against the incoming
+mappings, which are typically HTTP headers such as Accept, where the
+values may be a list of weighted values, e.g.
+
+    text/html, application/xhtml+xml;q=0.9, */*;q=0.8
+"""
+
+from repodono.model.cache import LRUCache
+
+default_qvalues_cache = LRUCache(maxsize=256)
+
+
+def parse_qvalues(value):
+    """
+    Parse the Accept-style value into a tuple of 2-tuples of the value
+    and its quality (between 0 and 1), in the order they were provided.
+    A quality that cannot be parsed is treated as 1, and any other
+    parameters are discarded.
+    """
+
+    results = []
+    for part in value.split(','):
+        item, *params = part.split(';')
+        item = item.strip()
+        if not item:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw = param.partition('=')
+            if name.strip().lower() != 'q':
+                continue
+            try:
+                quality = min(max(float(raw), 0.0), 1.0)
+            except ValueError:
+                pass
+        results.append((item, quality))
+    return tuple(results)
+
+
+def cached_parse_qvalues(value, cache=default_qvalues_cache):
+    """
+    Parse the value as per parse_qvalues, using the provided cache.  If
+    cache is None, the value is parsed for this call.
+    """
+
+    if cache is None:
+        return parse_qvalues(value)
+    result = cache.get(value)
+    if result is None:
+        result = parse_qvalues(value)
+        cache[value] = result
+    return result
+
+
+def score_value(value, accepted):
+    """
+    Return the score of the value (typically from the incoming mapping)
+    against the container of accepted values (typically from the
+    environment of a bucket).  A value found directly inside the
+    container scores 1, otherwise a string value is parsed as a list of
+    weighted values, with the highest quality of the values found in
+    the container being the score.  Wildcards are not expanded, such
+    that only the values listed by the container may be matched.
+    """
+
+    try:
+        if value in accepted:
+            return 1
+    except TypeError:
+        return 0
+    if not isinstance(value, str):
+        return 0
+    return max((
+        quality for item, quality in cached_parse_qvalues(value)
+        if item in accepted
+    ), default=0)
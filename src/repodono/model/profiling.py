@@ -0,0 +1,141 @@
+"""
+Profiling helpers for the executions within the repodono.model
+framework.
+
+An ExecutionTracer may be provided to an Execution (or produced for
+every instance through its tracer_factory attribute) to record the
+time taken for the instantiation of every resource and the call to the
+provider, and the records may be aggregated across executions using a
+TraceAggregator, e.g.
+
+    aggregator = TraceAggregator()
+
+    class ProfiledExecution(Execution):
+        tracer_factory = partial(ExecutionTracer, aggregator=aggregator)
+
+    config = Configuration(mapping, execution_class=ProfiledExecution)
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from operator import attrgetter
+from threading import Lock
+from time import perf_counter
+
+TraceRecord = namedtuple('TraceRecord', [
+    'kind', 'name', 'depth', 'parent', 'start', 'duration'])
+
+
+class ExecutionTracer(object):
+    """
+    A tracer that records the wall time taken for every traced call,
+    along with the nesting of those calls.  The nesting is tracked per
+    thread and per asyncio task, such that the calls traced by
+    concurrent tasks (e.g. the awaiting of the resources by an
+    AsyncExecution, traced as the 'await' kind) do not interfere with
+    each other.
+    """
+
+    def __init__(self, aggregator=None):
+        """
+        Arguments:
+
+        aggregator
+            An optional TraceAggregator that every completed trace will
+            be added to.
+        """
+
+        self.aggregator = aggregator
+        self.records = []
+        self.origin = perf_counter()
+        # the stack of names being traced for each context.
+        self.__stack = ContextVar('stack', default=())
+
+    @contextmanager
+    def __call__(self, kind, name):
+        stack = self.__stack.get()
+        parent = stack[-1] if stack else None
+        token = self.__stack.set(stack + (name,))
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            self.__stack.reset(token)
+            self.records.append(TraceRecord(
+                kind, name, len(stack), parent, start - self.origin,
+                duration,
+            ))
+            if self.aggregator is not None:
+                self.aggregator.add(kind, name, duration)
+
+    def report(self):
+        """
+        Return the records as a list of dicts, ordered by the time they
+        were started, with the start being relative to the creation of
+        this tracer.
+        """
+
+        return [
+            record._asdict()
+            for record in sorted(self.records, key=attrgetter('start'))
+        ]
+
+    def summary(self):
+        """
+        Return the summary of the records, as per TraceAggregator.
+        """
+
+        aggregator = TraceAggregator()
+        aggregator.update(self)
+        return aggregator.report()
+
+
+class TraceAggregator(object):
+    """
+    Aggregates the traces from any number of executions, tracking the
+    call count, the total and the maximum time taken for each kind and
+    name.
+    """
+
+    def __init__(self):
+        self.__stats = {}
+        self.__lock = Lock()
+
+    def add(self, kind, name, duration):
+        with self.__lock:
+            count, total, maximum = self.__stats.get(
+                (kind, name), (0, 0.0, 0.0))
+            self.__stats[(kind, name)] = (
+                count + 1, total + duration, max(maximum, duration))
+
+    def update(self, tracer):
+        """
+        Add all the records from the tracer.
+        """
+
+        for record in tracer.records:
+            self.add(record.kind, record.name, record.duration)
+
+    def clear(self):
+        with self.__lock:
+            self.__stats.clear()
+
+    def report(self):
+        """
+        Return the aggregated statistics as a list of dicts, ordered by
+        the total time taken in descending order.
+        """
+
+        with self.__lock:
+            stats = list(self.__stats.items())
+        return [{
+            'kind': kind,
+            'name': name,
+            'count': count,
+            'total': total,
+            'mean': total / count,
+            'max': maximum,
+        } for (kind, name), (count, total, maximum) in sorted(
+            stats, key=lambda item: item[1][1], reverse=True)]
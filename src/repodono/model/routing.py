@@ -3,6 +3,20 @@ This module provides helper functions and classes to assist in and
 demonstrates routing using URITemplates.
 """
 
+import json
+import logging
+import os
+import regex
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from hashlib import sha256
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from types import MappingProxyType
+
 from uritemplate import URITemplate
 
 from repodono.model.urimatch import (
@@ -14,6 +28,12 @@ from repodono.model.urimatch import (
     default_pattern_finalizer,
 )
 
+logger = logging.getLogger(__name__)
+
+# the version of the format of the state produced by the router, which
+# is to be incremented for any incompatible changes.
+router_state_version = 1
+
 
 class RoutableTemplateConverterFactory(TemplateConverterFactory):
 
@@ -40,9 +60,27 @@ class RoutableURITemplateMatcher(URITemplateMatcher):
 
     def __init__(
             self, template,
-            template_converter=routable_template_to_regex_patternstr):
+            template_converter=routable_template_to_regex_patternstr, **kw):
         return super().__init__(
-            template, template_converter=template_converter)
+            template, template_converter=template_converter, **kw)
+
+
+regex_metachar_splitter = regex.compile(r'[.^$*+?{}\[\]\\|()]').split
+
+
+def template_literal_prefix(
+        template, template_converter=routable_template_to_regex_patternstr):
+    """
+    Return the leading static fragment for the template that will be
+    matched literally by the pattern produced by the converter.
+
+    As the static fragments are used as is within the pattern, the
+    prefix will be truncated at the first regex metacharacter.
+    """
+
+    type_, name, orig, fragment = next(
+        template_converter.iter_template(template))
+    return regex_metachar_splitter(fragment, 1)[0]
 
 
 class URITemplateRouter(object):
@@ -53,28 +91,424 @@ class URITemplateRouter(object):
     specified in absolute terms.
     """
 
-    def __init__(self, uritemplates):
+    matcher_class = RoutableURITemplateMatcher
+
+    def __init__(self, uritemplates, cache=None, lazy=False):
         """
         Arguments
 
         uritemplates
-            A list of URITemplate objects.
+            A list of URITemplate objects, or matchers that have already
+            been built from them.
+
+        Optional Arguments
+
+        cache
+            An instance of LRUCache where the results will be memoized
+            by the incoming uri.  Cached results will be returned with
+            the mapping being read-only and with the exploded values as
+            tuples, such that the cached results cannot be modified.
+        lazy
+            If true, the matchers will be constructed such that their
+            patterns are only compiled when first required.
         """
 
+        self.cache = cache
         self.matchers = sorted(
-            RoutableURITemplateMatcher(template) for template in uritemplates)
+            template if isinstance(template, URITemplateMatcher) else
+            self.matcher_class(template, lazy=lazy)
+            for template in uritemplates
+        )
+        # templates without variables and are matched literally may be
+        # routed through a direct lookup, the remaining matchers will be
+        # attempted in the sorted order.
+        self.static_matchers = {}
+        self.dynamic_matchers = []
+        for matcher in self.matchers:
+            uri = matcher.template.uri
+            if (matcher.template.variables or
+                    template_literal_prefix(matcher.template) != uri):
+                self.dynamic_matchers.append(matcher)
+            else:
+                self.static_matchers.setdefault(uri, matcher)
 
     @classmethod
-    def from_strings(cls, uritemplate_strs):
+    def from_strings(cls, uritemplate_strs, **kw):
         """
         Construct a router from a list of strings that can be formed
         into a valid URITemplate.
         """
 
-        return cls(URITemplate(s) for s in uritemplate_strs)
+        return cls((URITemplate(s) for s in uritemplate_strs), **kw)
 
-    def __call__(self, uri):
-        for matcher in self.matchers:
+    def to_state(self):
+        """
+        Return a mapping of the state of the matchers of this router that
+        may be serialized as JSON.
+        """
+
+        return {
+            'version': router_state_version,
+            'matchers': [matcher.to_state() for matcher in self.matchers],
+        }
+
+    @classmethod
+    def from_state(cls, state, **kw):
+        """
+        Construct a router from the mapping produced by to_state, which
+        avoids the conversion and validation of the templates.  A
+        ValueError will be raised for a state that is not valid, which
+        includes patterns that cannot be compiled (unless lazy).
+        """
+
+        if not isinstance(state, dict):
+            raise ValueError('router state must be a mapping')
+        if state.get('version') != router_state_version:
+            raise ValueError('unsupported router state version')
+        try:
+            return cls((
+                cls.matcher_class.from_state(
+                    matcher_state, lazy=kw.get('lazy', False))
+                for matcher_state in state['matchers']
+            ), **kw)
+        except regex.error as e:
+            raise ValueError('invalid pattern in router state: %s' % e)
+
+    @classmethod
+    def from_strings_cached(cls, uritemplate_strs, cache_dir, **kw):
+        """
+        Construct a router from a list of strings like from_strings, but
+        with the state of the router persisted into a file inside the
+        cache_dir keyed by a digest of the strings, such that subsequent
+        construction with the same strings will restore the state from
+        that file.
+        """
+
+        uritemplate_strs = sorted(uritemplate_strs)
+        digest = sha256(json.dumps([
+            router_state_version,
+            cls.__module__, cls.__qualname__,
+            uritemplate_strs,
+        ]).encode('utf8')).hexdigest()
+        path = Path(cache_dir) / ('router-%s.json' % digest)
+
+        try:
+            with path.open(encoding='utf8') as fd:
+                return cls.from_state(json.load(fd), **kw)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("failed to restore router from '%s': %s", path, e)
+
+        router = cls.from_strings(uritemplate_strs, **kw)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                    'w', encoding='utf8', dir=str(path.parent),
+                    delete=False) as fd:
+                json.dump(router.to_state(), fd)
+            # ensure other processes will only see the complete file.
+            os.replace(fd.name, str(path))
+        except OSError as e:
+            logger.warning("failed to persist router to '%s': %s", path, e)
+        return router
+
+    def iter_matchers(self, uri):
+        """
+        Return the matchers that should be attempted for the provided
+        uri, in the order that they should be attempted.
+        """
+
+        return self.dynamic_matchers
+
+    def dispatch(self, uri):
+        """
+        Route the uri through the matchers that require matching.
+        """
+
+        for matcher in self.iter_matchers(uri):
             result = matcher(uri)
             if result is not None:
                 return matcher.template.uri, result
+
+    def route(self, uri):
+        """
+        Route the uri, without going through the cache.
+        """
+
+        matcher = self.static_matchers.get(uri)
+        if matcher is not None:
+            return matcher.template.uri, {}
+        return self.dispatch(uri)
+
+    @staticmethod
+    def freeze(result):
+        """
+        Produce an immutable version of the result.
+        """
+
+        if result is None:
+            return None
+        route, mapping = result
+        return route, MappingProxyType({
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in mapping.items()
+        })
+
+    def __call__(self, uri):
+        if self.cache is None:
+            return self.route(uri)
+        result = self.cache.get(uri, NotImplemented)
+        if result is NotImplemented:
+            result = self.freeze(self.route(uri))
+            self.cache[uri] = result
+        return result
+
+    @staticmethod
+    def copy(result):
+        """
+        Produce an independent copy of the result.
+        """
+
+        if result is None:
+            return None
+        route, mapping = result
+        return route, {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in mapping.items()
+        }
+
+    def route_chunk(self, uris):
+        """
+        Route a list of uris, returning the list of results in the same
+        order.  Every distinct uri will only be routed once, with the
+        repeated uris given a copy of that result.
+        """
+
+        route = self.route
+        copy = self.copy
+        routed = {}
+        results = []
+        for uri in uris:
+            if uri in routed:
+                results.append(copy(routed[uri]))
+            else:
+                routed[uri] = result = route(uri)
+                results.append(result)
+        return results
+
+    def map(self, uris, processes=None, chunksize=4096, prefetch=2):
+        """
+        Route an iterable of uris, yielding the results in the same
+        order as the incoming uris, bypassing the cache.
+
+        Arguments:
+
+        uris
+            An iterable of uris.
+
+        Optional Arguments:
+
+        processes
+            If specified, the uris will be routed by a pool with this
+            number of processes, each with a router constructed from
+            the same templates.
+        chunksize
+            The number of uris to be routed as a single unit of work.
+        prefetch
+            The number of chunks per process that may be pending at any
+            given time, such that the uris are only consumed as the
+            results are being produced.
+        """
+
+        iterator = iter(uris)
+        chunks = iter(lambda: list(islice(iterator, chunksize)), [])
+
+        if not processes:
+            for chunk in chunks:
+                yield from self.route_chunk(chunk)
+            return
+
+        with ProcessPoolExecutor(
+                max_workers=processes, initializer=_init_worker_router,
+                initargs=(type(self), [
+                    matcher.template.uri for matcher in self.matchers
+                ])) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_route_chunk, chunk))
+                if len(pending) >= processes * prefetch:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+
+# the router for the process started for URITemplateRouter.map
+_worker_router = None
+
+
+def _init_worker_router(router_class, uritemplate_strs):
+    global _worker_router
+    _worker_router = router_class.from_strings(uritemplate_strs)
+
+
+def _route_chunk(uris):
+    return _worker_router.route_chunk(uris)
+
+
+class StaticPrefixTree(object):
+    """
+    A radix tree where each node may hold a list of values, such that
+    all values assigned to keys that are a prefix of some provided
+    string may be retrieved by walking down the tree once.
+    """
+
+    class Node(object):
+        __slots__ = ('children', 'values')
+
+        def __init__(self):
+            # mapping of the first character of the edge label to the
+            # 2-tuple of the full label and the child node.
+            self.children = {}
+            self.values = []
+
+    def __init__(self):
+        self.root = self.Node()
+
+    def add(self, key, value):
+        node = self.root
+        pos = 0
+        while pos < len(key):
+            edge = node.children.get(key[pos])
+            if edge is None:
+                child = self.Node()
+                node.children[key[pos]] = (key[pos:], child)
+                node = child
+                break
+
+            label, child = edge
+            size = 1
+            while (size < len(label) and pos + size < len(key) and
+                    label[size] == key[pos + size]):
+                size += 1
+
+            if size < len(label):
+                # split the edge at the point where the key diverged.
+                split = self.Node()
+                split.children[label[size]] = (label[size:], child)
+                node.children[key[pos]] = (label[:size], split)
+                child = split
+
+            node = child
+            pos += size
+
+        node.values.append(value)
+
+    def find(self, key):
+        """
+        Return a list of all values assigned to keys that are a prefix
+        of the provided key, the values from the shorter prefix first.
+        """
+
+        node = self.root
+        pos = 0
+        results = list(node.values)
+        while pos < len(key):
+            edge = node.children.get(key[pos])
+            if edge is None:
+                break
+            label, node = edge
+            if not key.startswith(label, pos):
+                break
+            pos += len(label)
+            results.extend(node.values)
+        return results
+
+
+class PrefixTreeURITemplateRouter(URITemplateRouter):
+    """
+    A router that indexes the matchers by the static prefix of their
+    templates with a radix tree, such that only the matchers with a
+    prefix that matches the incoming uri will be attempted, in the same
+    order as the sorted matchers.
+    """
+
+    def __init__(self, uritemplates, **kw):
+        super().__init__(uritemplates, **kw)
+        self.tree = StaticPrefixTree()
+        for idx, matcher in enumerate(self.dynamic_matchers):
+            self.tree.add(
+                template_literal_prefix(matcher.template), (idx, matcher))
+
+    def iter_matchers(self, uri):
+        return [matcher for idx, matcher in sorted(
+            self.tree.find(uri), key=itemgetter(0))]
+
+
+class CompiledURITemplateRouter(URITemplateRouter):
+    """
+    A router that compiles all the sorted matchers that require matching
+    into a single regex pattern, with every template being a named
+    branch of an alternation in the same order as the sorted matchers.
+    As the alternation will be attempted in order, the precedence as
+    defined by the sort key is preserved, while only a single regex
+    match is required to dispatch any given uri.
+    """
+
+    def __init__(self, uritemplates, **kw):
+        super().__init__(uritemplates, **kw)
+        self.compile()
+
+    def compile(self):
+        """
+        Build the combined pattern and the table of branches, where each
+        branch is keyed by the name of the group for its template and
+        the value being the matcher paired with the extractors for the
+        variables.
+        """
+
+        branches = []
+        prefixes = []
+        for idx, matcher in enumerate(self.dynamic_matchers):
+            branch = '_%d' % idx
+            # the group prefix ensures that variables sharing the same
+            # name across templates will not collide.
+            group_prefix = branch + '_'
+            converter = RoutableTemplateConverterFactory(
+                operator_patterns=raw_operator_patterns,
+                pattern_finalizer=partial(
+                    default_pattern_finalizer, group_prefix=group_prefix),
+            )
+            branches.append('(?P<%s>%s)' % (
+                branch, converter(matcher.template)))
+            prefixes.append((branch, group_prefix, matcher))
+
+        self.regex_pattern = regex.compile('|'.join(branches))
+        groupindex = self.regex_pattern.groupindex
+        self.branches = {
+            branch: (matcher, tuple(
+                (
+                    variable, groupindex[group_prefix + variable],
+                    bool(details['explode']),
+                )
+                for variable, details in matcher.variables
+                # variables with an empty pattern will not have a group
+                if group_prefix + variable in groupindex
+            ))
+            for branch, group_prefix, matcher in prefixes
+        }
+
+    def dispatch(self, uri):
+        match = self.regex_pattern.match(uri)
+        if match is None or match.lastgroup is None:
+            # the latter is the case when there are no templates.
+            return None
+
+        matcher, extractors = self.branches[match.lastgroup]
+        results = {}
+        for variable, index, explode in extractors:
+            if explode:
+                results[variable] = match.captures(index)
+            else:
+                results[variable] = match.group(index)
+        return matcher.template.uri, results
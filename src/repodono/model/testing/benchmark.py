@@ -0,0 +1,413 @@
+"""
+Benchmark helpers for the routing implementations provided by this
+package.  This may be executed directly, e.g.
+
+    python -m repodono.model.testing.benchmark
+
+to produce a report on the build time, the memory used and the lookup
+latency percentiles against the number of routes for each of the
+available routing implementations.  The route tables and the order of
+the lookups are generated deterministically from the provided seed, so
+that the results from different revisions may be compared with each
+other; use ``--json`` to produce a machine readable report for tracking
+regressions over time.
+
+Alternatively, with ``--resources`` the overhead for the resolution of
+each resource for endpoints with many resources is reported instead.
+"""
+
+import json
+import tracemalloc
+from argparse import ArgumentParser
+from collections import namedtuple
+from random import Random
+from time import perf_counter
+from timeit import Timer
+
+from uritemplate import URITemplate
+
+from repodono.model.config import Configuration
+from repodono.model.routing import (
+    URITemplateRouter,
+    CompiledURITemplateRouter,
+    PrefixTreeURITemplateRouter,
+)
+from repodono.model.urimatch_sanic import templateuri_to_sanic_routeuri
+
+try:
+    from werkzeug.exceptions import NotFound as WerkzeugNotFound
+    from werkzeug.routing import Map
+    from repodono.model.urimatch_flask import URITemplateRule
+except ImportError:  # pragma: no cover
+    Map = None
+
+try:
+    from sanic.exceptions import NotFound as SanicNotFound
+    from sanic.router import Router as SanicRouter
+except ImportError:  # pragma: no cover
+    SanicRouter = None
+
+default_router_classes = (
+    URITemplateRouter,
+    CompiledURITemplateRouter,
+    PrefixTreeURITemplateRouter,
+)
+
+default_route_counts = (10, 50, 100, 200, 400)
+
+default_suite_route_counts = (10, 100, 1000, 10000)
+
+default_route_kinds = ('static', 'variable', 'explode')
+
+default_percentiles = (50, 90, 99)
+
+default_resource_counts = (1, 10, 100, 1000)
+
+route_generators = {
+    'static': lambda idx: (
+        '/api/v1/static%d/index' % idx,
+        '/api/v1/static%d/index' % idx,
+    ),
+    'variable': lambda idx: (
+        '/api/v1/repo%d/{id}/view' % idx,
+        '/api/v1/repo%d/some_id/view' % idx,
+    ),
+    'explode': lambda idx: (
+        '/api/v1/tree%d/{id}{/path*}' % idx,
+        '/api/v1/tree%d/some_id/a/nested/path' % idx,
+    ),
+}
+
+Target = namedtuple('Target', ['name', 'build'])
+
+BenchmarkResult = namedtuple('BenchmarkResult', [
+    'name', 'count', 'build_time', 'memory', 'lookups', 'mean',
+    'percentiles',
+])
+
+_SanicRequest = namedtuple('_SanicRequest', ['path', 'method'])
+
+
+def generate_route_table(count, kinds=default_route_kinds):
+    """
+    Generate a list of 2-tuples of template string and a sample uri
+    that should be routed to that template, with the templates being a
+    mixture of the typical ones (static, variable and path explodes),
+    cycling through the provided kinds.
+    """
+
+    generators = [route_generators[kind] for kind in kinds]
+    return [
+        generators[idx % len(generators)](idx) for idx in range(count)]
+
+
+def router_target(router_class):
+    """
+    Return a Target for the provided URITemplateRouter class.
+    """
+
+    return Target(router_class.__name__, router_class.from_strings)
+
+
+def build_werkzeug_lookup(templates):
+    """
+    Build a werkzeug Map of URITemplateRule from the templates and
+    return the function to match a uri against it, returning None for
+    uris that are not found.
+    """
+
+    adapter = Map([
+        URITemplateRule(template, endpoint=template)
+        for template in templates
+    ]).bind('example.com')
+
+    def lookup(uri):
+        try:
+            return adapter.match(uri)
+        except WerkzeugNotFound:
+            return None
+
+    return lookup
+
+
+def build_sanic_lookup(templates):
+    """
+    Build a sanic Router with the routes converted from the templates
+    using templateuri_to_sanic_routeuri, and return the function to
+    match a uri against it, returning None for uris that are not found.
+    """
+
+    router = SanicRouter()
+    for template in templates:
+        router.add(
+            templateuri_to_sanic_routeuri(URITemplate(template)), ['GET'],
+            template, strict_slashes=True,
+        )
+
+    def lookup(uri):
+        try:
+            return router.get(_SanicRequest(uri, 'GET'))
+        except SanicNotFound:
+            return None
+
+    return lookup
+
+
+def default_targets():
+    """
+    Return the list of Targets available in the current environment;
+    the werkzeug and sanic based targets are only included if those
+    packages are installed.
+    """
+
+    targets = [router_target(cls) for cls in default_router_classes]
+    if Map is not None:  # pragma: no cover
+        targets.append(Target('URITemplateRule', build_werkzeug_lookup))
+    if SanicRouter is not None:  # pragma: no cover
+        targets.append(Target('SanicRouter', build_sanic_lookup))
+    return targets
+
+
+def measure_build(build, templates):
+    """
+    Return a 3-tuple of the lookup function built from the templates,
+    the time in seconds taken for the build, and the peak memory in
+    bytes allocated during the build.
+    """
+
+    start = perf_counter()
+    build(templates)
+    build_time = perf_counter() - start
+
+    # measured separately as tracing slows down the allocations.
+    tracemalloc.start()
+    try:
+        lookup = build(templates)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return lookup, build_time, peak
+
+
+def measure_lookup(router, uris, number=10):
+    """
+    Return the mean time in seconds to route a single uri, with each of
+    the provided uris routed for the specified number of times.
+    """
+
+    def run():
+        for uri in uris:
+            router(uri)
+
+    return Timer(run).timeit(number=number) / (number * len(uris))
+
+
+def measure_latencies(lookup, uris, number=10):
+    """
+    Return the sorted list of times in seconds for each individual
+    lookup, with each of the provided uris looked up for the specified
+    number of times.
+    """
+
+    samples = []
+    for _ in range(number):
+        for uri in uris:
+            start = perf_counter()
+            lookup(uri)
+            samples.append(perf_counter() - start)
+    samples.sort()
+    return samples
+
+
+def percentile(samples, point):
+    """
+    Return the value at the percentile point (0 to 100) from the sorted
+    list of samples, using the nearest rank.
+    """
+
+    if not samples:
+        raise ValueError('no samples provided')
+    rank = int(round(point / 100 * len(samples))) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+def run_benchmark(
+        targets=None, route_counts=default_suite_route_counts,
+        kinds=default_route_kinds, number=5, sample_size=1000, seed=0,
+        points=default_percentiles):
+    """
+    Run the benchmark suite, returning a list of BenchmarkResult for
+    every target against every route count.
+
+    For each route count, up to sample_size uris (plus a miss, to
+    capture the worst case) are drawn from the generated route table
+    using the seed, and are looked up in the same shuffled order for
+    every target for the specified number of times.
+    """
+
+    targets = default_targets() if targets is None else targets
+    results = []
+    for count in route_counts:
+        random = Random('%s:%d' % (seed, count))
+        table = generate_route_table(count, kinds=kinds)
+        templates = [template for template, uri in table]
+        uris = [uri for template, uri in table]
+        if len(uris) > sample_size:
+            uris = random.sample(uris, sample_size)
+        else:
+            random.shuffle(uris)
+        uris.append('/nowhere')
+        for target in targets:
+            lookup, build_time, memory = measure_build(
+                target.build, templates)
+            samples = measure_latencies(lookup, uris, number=number)
+            results.append(BenchmarkResult(
+                target.name, count, build_time, memory, len(samples),
+                sum(samples) / len(samples),
+                {point: percentile(samples, point) for point in points},
+            ))
+    return results
+
+
+def report_lookup(
+        router_classes=default_router_classes,
+        route_counts=default_route_counts, number=10):
+    """
+    Produce a list of 3-tuple of router class name, number of routes and
+    the per-lookup cost in seconds.
+    """
+
+    results = []
+    for count in route_counts:
+        table = generate_route_table(count)
+        templates = [template for template, uri in table]
+        # include a miss to capture the worst case.
+        uris = [uri for template, uri in table] + ['/nowhere']
+        for router_class in router_classes:
+            router = router_class.from_strings(templates)
+            results.append((
+                router_class.__name__, count,
+                measure_lookup(router, uris, number=number),
+            ))
+    return results
+
+
+def generate_resource_config(count):
+    """
+    Generate a configuration mapping with a single endpoint that has
+    the specified number of resources defined, where the provider
+    references every one of those resources.
+    """
+
+    resources = [{
+        '__name__': 'resource%d' % idx,
+        '__init__': 'repodono.model.testing:Thing',
+        'path': 'value',
+    } for idx in range(count)]
+    resources.append({
+        '__name__': 'provider',
+        '__init__': 'repodono.model.testing:Thing',
+        'path': ['resource%d' % idx for idx in range(count)],
+    })
+    return {
+        'environment': {
+            'variables': {'value': 'value'},
+            'paths': {'root': '/'},
+        },
+        'bucket': {'_': {'__roots__': ['root']}},
+        'resource': {'/': resources},
+        'endpoint': {'_': {'/': {'__provider__': 'provider'}}},
+    }
+
+
+def measure_resources(config, route, number=100):
+    """
+    Return the mean time in seconds to create an execution for the
+    route from the configuration and execute it.
+    """
+
+    def run():
+        config.request_execution(route, {})()
+
+    return Timer(run).timeit(number=number) / number
+
+
+def report_resources(resource_counts=default_resource_counts, number=100):
+    """
+    Produce a list of 2-tuple of the number of resources for an endpoint
+    and the cost in seconds for the resolution of each resource through
+    the execution of that endpoint.
+    """
+
+    results = []
+    for count in resource_counts:
+        config = Configuration(generate_resource_config(count))
+        # the provider itself is also a resource.
+        results.append((count, measure_resources(
+            config, '/', number=number) / (count + 1)))
+    return results
+
+
+def format_result(result):
+    """
+    Format a BenchmarkResult as a line of text.
+    """
+
+    return '%-30s %6d routes %10.2f ms build %10.1f KiB %s' % (
+        result.name, result.count, result.build_time * 1000,
+        result.memory / 1024, ' '.join(
+            'p%s %8.2f us' % (point, value * 1000000)
+            for point, value in sorted(result.percentiles.items())
+        ),
+    )
+
+
+def main(argv=None):  # pragma: no cover
+    parser = ArgumentParser(description='benchmark the uri routers')
+    parser.add_argument(
+        '--counts', type=int, nargs='+', default=default_suite_route_counts,
+        help='the number of routes to benchmark against')
+    parser.add_argument(
+        '--kinds', nargs='+', choices=sorted(route_generators),
+        default=default_route_kinds,
+        help='the kinds of templates to generate the route tables with')
+    parser.add_argument(
+        '--targets', nargs='+',
+        help='restrict the benchmark to the named targets')
+    parser.add_argument(
+        '--number', type=int, default=5,
+        help='the number of times each sampled uri is looked up')
+    parser.add_argument(
+        '--sample-size', type=int, default=1000,
+        help='the maximum number of distinct uris sampled per route table')
+    parser.add_argument('--seed', default=0, help='the random seed')
+    parser.add_argument(
+        '--json', action='store_true', help='produce the report as json')
+    parser.add_argument(
+        '--resources', action='store_true',
+        help='report the per-resource overhead for executions instead')
+    args = parser.parse_args(argv)
+
+    if args.resources:
+        for count, cost in report_resources():
+            print('%6d resources %10.2f us/resource' % (
+                count, cost * 1000000))
+        return
+
+    targets = default_targets()
+    if args.targets:
+        targets = [
+            target for target in targets if target.name in args.targets]
+    results = run_benchmark(
+        targets=targets, route_counts=args.counts, kinds=args.kinds,
+        number=args.number, sample_size=args.sample_size, seed=args.seed,
+    )
+    if args.json:
+        print(json.dumps([result._asdict() for result in results], indent=2))
+    else:
+        for result in results:
+            print(format_result(result))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -27,6 +27,12 @@ from repodono.model.base import (
     BoundedEndpointDefinition,
     ReMappingDefinitionMapping,
     RouteTrieMapping,
+    build_resource_graph,
+    compile_vars_value,
+    iter_vars_references,
+    plan_resources,
+    stage_resources,
+    map_vars_value,
     structured_mapper,
     StructuredMapping,
 )
@@ -35,6 +41,71 @@ from repodono.model.testing import Thing
 from repodono.model.testing import AttrBaseMapping
 
 
+class CompileVarsValueTestCase(unittest.TestCase):
+
+    def test_resolution(self):
+        vars_ = AttrBaseMapping({
+            'name': 'value',
+            'thing': Thing(path='thing_path'),
+        })
+        spec = {
+            'name': 'name',
+            'dot': 'thing.path',
+            'literal': '"literal"',
+            'number': 1,
+            'boolean': False,
+            'items': ['name', ['"nested"', 2]],
+        }
+        result = {
+            'name': 'value',
+            'dot': 'thing_path',
+            'literal': 'literal',
+            'number': 1,
+            'boolean': False,
+            'items': ['value', ['nested', 2]],
+        }
+        resolver = compile_vars_value(spec)
+        self.assertEqual(result, resolver(vars_))
+        self.assertEqual(result, map_vars_value(spec, vars_))
+
+        # resolvers are reusable against other mappings.
+        vars_ = AttrBaseMapping({
+            'name': 'other',
+            'thing': Thing(path='other_path'),
+        })
+        self.assertEqual('other', resolver(vars_)['name'])
+        self.assertEqual('other_path', resolver(vars_)['dot'])
+
+    def test_literal_copies(self):
+        resolver = compile_vars_value('"a", ["b"]')
+        first = resolver({})
+        first[1].append('c')
+        self.assertEqual(('a', ['b']), resolver({}))
+
+    def test_deferred_errors(self):
+        missing = compile_vars_value('missing')
+        invalid_literal = compile_vars_value('"unterminated')
+        invalid_type = compile_vars_value(NotImplemented)
+
+        with self.assertRaises(MappingReferenceError) as e:
+            missing({})
+        self.assertEqual(
+            "reference to 'missing' could not be resolved",
+            e.exception.args[0])
+
+        with self.assertRaises(MappingReferenceError) as e:
+            invalid_literal({})
+        self.assertEqual(
+            "'\"unterminated' is an unsupported literal value",
+            e.exception.args[0])
+
+        with self.assertRaises(MappingReferenceError) as e:
+            invalid_type({})
+        self.assertEqual(
+            "NotImplemented is of an unsupported type for mapping",
+            e.exception.args[0])
+
+
 class BaseMappingTestCase(unittest.TestCase):
 
     def test_basic(self):
@@ -208,6 +279,43 @@ class FlatGroupedMappingTestCase(unittest.TestCase):
 
         self.assertEqual(3, len(mapping))
 
+    def test_contains_probes_mappings(self):
+        inner = {'abc': '1'}
+        mapping = FlatGroupedMapping([inner])
+        self.assertIn('abc', mapping)
+        self.assertNotIn('def', mapping)
+        # uncached mappings reflect changes made to the inner mappings.
+        inner['def'] = '2'
+        self.assertIn('def', mapping)
+        self.assertEqual(['abc', 'def'], sorted(mapping))
+
+    def test_cache_keys(self):
+        class CachedFlatGroupedMapping(FlatGroupedMapping):
+            cache_keys = True
+
+        inner = {'abc': '1'}
+        mapping = CachedFlatGroupedMapping([inner])
+        self.assertEqual(['abc'], sorted(mapping))
+        self.assertEqual(1, len(mapping))
+
+        # the combined keys are cached...
+        inner['def'] = '2'
+        self.assertEqual(1, len(mapping))
+        # ... but membership is still resolved from the mappings.
+        self.assertIn('def', mapping)
+
+        # assignment and deletion invalidates the cached keys.
+        mapping['ghi'] = '3'
+        self.assertEqual(['abc', 'def', 'ghi'], sorted(mapping))
+        inner['jkl'] = '4'
+        del mapping['ghi']
+        self.assertEqual(['abc', 'def', 'jkl'], sorted(mapping))
+        self.assertEqual(3, len(mapping))
+
+        with self.assertRaises(KeyError):
+            mapping['abc'] = '5'
+        self.assertEqual(3, len(mapping))
+
     def test_mapping_instantiation_assigned(self):
         mapping = FlatGroupedMapping([
             {
@@ -969,6 +1077,41 @@ class BaseResourceDefinitionTestCase(unittest.TestCase):
             '__path__': 'modified',
         })().path, 'static')
 
+    def test_resolve(self):
+        definition = BaseResourceDefinition(name='thing', call=Thing, kwargs={
+            'path': 'target',
+        })
+        vars_ = {'target': 'value', 'other': 'other'}
+        self.assertEqual(definition.resolve(vars_).path, 'value')
+        self.assertEqual(definition.resolve(
+            vars_, omit_keys={'path': 1}.keys(), kwargs={'path': 'given'},
+        ).path, 'given')
+        self.assertEqual(definition.resolve_kwargs(
+            vars_, omit_keys=['path']), {})
+
+    def test_consts_dotted(self):
+        definition = BaseResourceDefinition(name='thing', call=Thing, kwargs={
+            'path': 'const.path',
+        }, consts={
+            'const': Thing(path='const_path'),
+        })
+        self.assertEqual(definition.resolve({
+            'const': Thing(path='shadowed'),
+        }).path, 'const_path')
+        definition.consts = {}
+        self.assertEqual(definition.resolve({
+            'const': Thing(path='unshadowed'),
+        }).path, 'unshadowed')
+
+    def test_kwargs_reassigned(self):
+        definition = BaseResourceDefinition(
+            name='thing', call=Thing, kwargs={'path': 'first'})
+        vars_ = {'first': 1, 'second': 2}
+        self.assertEqual(definition(vars_)().path, 1)
+        definition.kwargs = {'path': 'second'}
+        self.assertEqual(definition.kwargs, {'path': 'second'})
+        self.assertEqual(definition(vars_)().path, 2)
+
     def test_various_types(self):
         # More additional testing is done in test_config for more
         # varied use cases from simulated toml configurations.
@@ -1085,6 +1228,24 @@ class ResourceDefinitionMappingTestCase(unittest.TestCase):
         self.assertTrue(isinstance(result, Thing))
         self.assertIs(result.path, a_path)
 
+    def test_volatile(self):
+        mapping = ResourceDefinitionMapping({
+            '/some/path/{id}': [{
+                '__name__': 'obj1',
+                '__init__': 'repodono.model.testing:Thing',
+                'path': 'a_path',
+            }, {
+                '__name__': 'obj2',
+                '__init__': 'repodono.model.testing:Thing',
+                '__volatile__': True,
+                'path': 'a_path',
+            }]
+        })
+        obj1, obj2 = mapping['/some/path/{id}']
+        self.assertFalse(obj1.volatile)
+        self.assertTrue(obj2.volatile)
+        self.assertNotIn('__volatile__', obj2.kwargs)
+
     def test_name_reference_creation_multiple_values(self):
         mapping = ResourceDefinitionMapping({
             '/some/path/{id}': [{
@@ -1205,6 +1366,24 @@ class BaseBucketDefinitionTestCase(unittest.TestCase):
             'accept-language': 'ja-JP',
         }))
 
+    def test_qvalue_match(self):
+        bucket = BaseBucketDefinition('base', [], {
+            'accept': ['text/xml', 'application/xml'],
+            'accept-language': ['en-NZ', 'en-US'],
+        })
+        self.assertEqual(0.5, bucket.match({
+            'accept': 'text/html, application/xml;q=0.5',
+            'accept-language': 'en-NZ',
+        }))
+        self.assertAlmostEqual(0.25, bucket.match({
+            'accept': 'text/html, application/xml;q=0.5',
+            'accept-language': 'en-US;q=0.5, en;q=0.4',
+        }))
+        self.assertEqual(0, bucket.match({
+            'accept': 'text/html, application/xml;q=0',
+            'accept-language': 'en-NZ',
+        }))
+
 
 class BucketDefinitionMappingTestCase(unittest.TestCase):
 
@@ -1269,6 +1448,138 @@ class BucketDefinitionMappingTestCase(unittest.TestCase):
         self.assertEqual(
             mapping({'accept': 'text/html'}), mapping({'accept': '*/*'}))
 
+    def test_memoized_resolution(self):
+        mapping = BucketDefinitionMapping({
+            '_': {
+                '__roots__': ['some_location'],
+            },
+            'json': {
+                '__roots__': ['json_location'],
+                'accept': ['application/json'],
+            },
+            'en': {
+                '__roots__': ['en_location'],
+                'accept-language': ['en'],
+            },
+        })
+        self.assertEqual(('accept', 'accept-language'), mapping.inspected_keys)
+        first = mapping({'accept': 'application/json', 'user-agent': 'a'})
+        self.assertEqual(['json', '_'], [key for key, bucket in first])
+        # unrelated keys do not affect the memoized result.
+        second = mapping({'accept': 'application/json', 'user-agent': 'b'})
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(1, mapping.cache.hits)
+        self.assertEqual(1, mapping.cache.misses)
+
+        self.assertEqual(['en', '_'], [key for key, bucket in mapping({
+            'accept-language': 'en'})])
+        # unhashable values bypass the cache.
+        self.assertEqual(['_'], [key for key, bucket in mapping({
+            'accept': ['application/json']})])
+        self.assertEqual(2, len(mapping.cache))
+
+        # assignments invalidate the memoized results.
+        mapping['xml'] = {
+            '__roots__': ['xml_location'],
+            'accept': ['application/xml'],
+        }
+        self.assertEqual(0, len(mapping.cache))
+        self.assertEqual(['xml', '_'], [key for key, bucket in mapping({
+            'accept': 'application/xml'})])
+        del mapping['xml']
+        self.assertEqual(['_'], [key for key, bucket in mapping({
+            'accept': 'application/xml'})])
+
+    def test_index(self):
+        class Anything(object):
+            def __contains__(self, value):
+                return True
+
+        mapping = BucketDefinitionMapping({
+            '_': {
+                '__roots__': ['some_location'],
+            },
+            'json': {
+                '__roots__': ['json_location'],
+                'accept': ['text/json', 'application/json'],
+            },
+            'json_en': {
+                '__roots__': ['json_location'],
+                'accept': ['application/json'],
+                'accept-language': ('en', 'en-US'),
+            },
+            'any': {
+                '__roots__': ['any_location'],
+                'accept': Anything(),
+            },
+        })
+        index, constrained, unindexed = mapping.index
+        self.assertEqual({'json', 'json_en'}, index[
+            ('accept', 'application/json')])
+        self.assertEqual({'json'}, index[('accept', 'text/json')])
+        self.assertEqual({
+            'accept': {'json', 'json_en'},
+            'accept-language': {'json_en'},
+        }, constrained)
+        self.assertEqual({'any'}, unindexed)
+
+        self.assertEqual({'_', 'any'}, mapping.candidates({}))
+        self.assertEqual({'_', 'any', 'json'}, mapping.candidates({
+            'accept': 'text/json', 'accept-language': 'en'}))
+        self.assertEqual({'_', 'any', 'json', 'json_en'}, mapping.candidates({
+            'accept': 'application/json', 'accept-language': 'en-US'}))
+        self.assertEqual({'_', 'any'}, mapping.candidates({
+            'accept': ['application/json']}))
+
+        # candidates that are not indexed are still matched.
+        self.assertEqual(['any', '_'], [key for key, bucket in mapping({
+            'accept': 'text/html'})])
+        self.assertEqual(['json_en', 'json', 'any', '_'], [
+            key for key, bucket in mapping.resolve({
+                'accept': 'application/json', 'accept-language': 'en'})])
+
+        del mapping['json_en']
+        self.assertNotIn('accept-language', mapping.index[1])
+
+    def test_weighted_resolution(self):
+        mapping = BucketDefinitionMapping({
+            '_': {
+                '__roots__': ['some_location'],
+            },
+            'json': {
+                '__roots__': ['json_location'],
+                'accept': ['application/json'],
+            },
+            'xml': {
+                '__roots__': ['xml_location'],
+                'accept': ['application/xml'],
+            },
+        })
+        self.assertEqual(['xml', 'json', '_'], [key for key, bucket in mapping(
+            {'accept': 'application/json;q=0.5, application/xml'})])
+        # explicit matches rank above the unconstrained default bucket,
+        # despite it always having the full score.
+        self.assertEqual(['json', '_'], [key for key, bucket in mapping(
+            {'accept': 'application/json;q=0.5, application/xml;q=0'})])
+        self.assertEqual(['json', 'xml', '_'], [key for key, bucket in mapping(
+            {'accept': 'application/json;q=0.9, application/xml;q=0.8'})])
+        # equal scores are ordered by the key.
+        self.assertEqual(['xml', 'json', '_'], [key for key, bucket in mapping(
+            {'accept': 'application/json, application/xml'})])
+
+    def test_memoization_disabled(self):
+        class NoCacheBucketDefinitionMapping(BucketDefinitionMapping):
+            cache_size = 0
+
+        mapping = NoCacheBucketDefinitionMapping({
+            '_': {
+                '__roots__': ['some_location'],
+            },
+        })
+        self.assertIsNone(mapping.cache)
+        self.assertEqual(['_'], [key for key, bucket in mapping({})])
+
 
 class EndpointDefinitionMappingTestCase(unittest.TestCase):
 
@@ -1282,6 +1593,29 @@ class EndpointDefinitionMappingTestCase(unittest.TestCase):
                 }
             }, bucket_name='bucket_name')
 
+    def test_timeout(self):
+        mapping = EndpointDefinitionMapping({
+            '/': {
+                '__provider__': 'some_provider',
+                '__timeout__': 1.5,
+            },
+            '/none': {
+                '__provider__': 'some_provider',
+            },
+        }, bucket_name='bucket_name')
+        self.assertEqual(1.5, mapping['/'].timeout)
+        self.assertNotIn('__timeout__', mapping['/'].environment)
+        self.assertIsNone(mapping['/none'].timeout)
+
+        for timeout in (0, -1, '1', True):
+            with self.assertRaises(ValueError):
+                EndpointDefinitionMapping({
+                    '/': {
+                        '__provider__': 'some_provider',
+                        '__timeout__': timeout,
+                    },
+                }, bucket_name='bucket_name')
+
     def test_missing_optional(self):
         mapping = EndpointDefinitionMapping({
             '/some/path/{id}': {
@@ -1915,5 +2249,162 @@ class ExecutionLocalsTestCase(unittest.TestCase):
         ])
         self.assertEqual(exec_locals['use_mode'].path, 'the_mode')
 
+    def test_resource_instantiated_once(self):
+        calls = []
+
+        def factory(**kw):
+            calls.append(kw)
+            return object()
+
+        rd_map = ResourceDefinitionMapping({
+            '/': [{
+                '__name__': 'shared',
+                '__call__': 'factory',
+            }, {
+                '__name__': 'first',
+                '__init__': 'repodono.model.testing:Thing',
+                'path': 'shared',
+            }, {
+                '__name__': 'second',
+                '__init__': 'repodono.model.testing:Thing',
+                'path': 'shared',
+            }],
+        })
+        crrd_map = CompiledRouteResourceDefinitionMapping(
+            RouteTrieMapping(rd_map))
+        exec_locals = ExecutionLocals([
+            crrd_map['/'], {'factory': factory}])
+
+        self.assertIs(exec_locals['first'].path, exec_locals['second'].path)
+        self.assertIs(exec_locals['shared'], exec_locals['first'].path)
+        self.assertIs(exec_locals['first'], exec_locals['first'])
+        self.assertEqual(1, len(calls))
+
+        # a new instance will have its own set of resources.
+        other_locals = ExecutionLocals([
+            crrd_map['/'], {'factory': factory}])
+        self.assertIsNot(other_locals['shared'], exec_locals['shared'])
+        self.assertEqual(2, len(calls))
+
+    def test_resource_volatile(self):
+        calls = []
+
+        def factory(**kw):
+            calls.append(kw)
+            return object()
+
+        rd_map = ResourceDefinitionMapping({
+            '/': [{
+                '__name__': 'volatile',
+                '__call__': 'factory',
+                '__volatile__': True,
+            }],
+        })
+        crrd_map = CompiledRouteResourceDefinitionMapping(
+            RouteTrieMapping(rd_map))
+        exec_locals = ExecutionLocals([
+            crrd_map['/'], {'factory': factory}])
+
+        self.assertIsNot(exec_locals['volatile'], exec_locals['volatile'])
+        self.assertEqual(2, len(calls))
+
+
+class ResourcePlanTestCase(unittest.TestCase):
+
+    def test_iter_vars_references(self):
+        self.assertEqual(['a', 'b', 'c', 'd', 'e'], list(iter_vars_references([
+            'a', {'key': 'b.attr'}, '"literal"', 1, True,
+            [attrgetter('c'), attrgetter('d.attr', 'e')],
+        ])))
+
+    def test_build_resource_graph(self):
+        rd_map = ResourceDefinitionMapping({
+            '/': [{
+                '__name__': 'first',
+                '__init__': 'repodono.model.testing:Thing',
+                'path': ['env', '__route__'],
+            }, {
+                '__name__': 'second',
+                '__call__': 'first.method',
+                'arg': 'third',
+            }, {
+                '__name__': 'third',
+                '__init__': 'repodono.model.testing:Thing',
+                'path': 'first',
+            }, {
+                '__name__': 'env',
+                '__init__': 'repodono.model.testing:Thing',
+                'path': 'third',
+            }],
+        })
+        resources = CompiledRouteResourceDefinitionMapping(
+            RouteTrieMapping(rd_map))['/']
+        self.assertEqual({
+            'first': set(),
+            'second': {'first', 'third'},
+            'third': {'first'},
+        }, build_resource_graph(resources, shadowed={'env'}))
+        self.assertEqual({
+            'first': set(),
+            'second': {'first'},
+            'third': {'first'},
+        }, build_resource_graph(
+            resources, shadowed={'env'}, overrides=('second', {'arg': 'x'})))
+        self.assertEqual({
+            'first': set(),
+            'second': {'first', 'third'},
+            'third': {'first'},
+        }, build_resource_graph(
+            resources, shadowed={'env'},
+            overrides=('second', {'arg': {'nested': 'third'}})))
+        # references through the remap are followed to their targets,
+        # unless the name is resolved directly.
+        self.assertEqual({
+            'first': set(),
+            'second': {'first', 'third'},
+            'third': {'first'},
+        }, build_resource_graph(
+            resources, shadowed={'env'}, overrides=('second', {
+                'arg': 'alias', 'kw': 'env', 'x': 'first'}),
+            remap={
+                'alias': {'nested': 'other'}, 'other': 'third',
+                'env': 'second', 'first': 'second',
+            }))
+
+    def test_plan_resources(self):
+        graph = {
+            'a': {'b', 'c'},
+            'b': {'c'},
+            'c': set(),
+            'd': {'a'},
+        }
+        self.assertEqual(('c', 'b', 'a'), plan_resources(graph, ['a']))
+        self.assertEqual(('c', 'b', 'a', 'd'), plan_resources(graph, 'dcba'))
+        self.assertEqual((), plan_resources(graph, ['missing']))
+
+        graph['c'] = {'d'}
+        with self.assertRaises(MappingReferenceError) as e:
+            plan_resources(graph, ['a'])
+        self.assertEqual(
+            'cyclic reference between resources: a -> b -> c -> d -> a',
+            e.exception.args[0])
+
+        graph = {
+            'a': {'b', 'c'},
+            'b': {'d'},
+            'c': set(),
+            'd': set(),
+            'e': set(),
+        }
+        self.assertEqual(
+            (('e', 'd', 'c'), ('b',), ('a',)),
+            stage_resources(graph, plan_resources(graph, 'edcba')))
+        self.assertEqual((), stage_resources(graph, ()))
+
+        with self.assertRaises(MappingReferenceError) as e:
+            plan_resources({'a': {'a'}}, ['a'])
+        self.assertEqual(
+            'cyclic reference between resources: a -> a',
+            e.exception.args[0])
 
 # Test cases for the Execution class is found in test_config
@@ -0,0 +1,122 @@
+import unittest
+
+from uritemplate import URITemplate
+
+from repodono.model.routing import URITemplateRouter
+from repodono.model.config import Configuration
+from repodono.model.testing.benchmark import Target
+from repodono.model.testing.benchmark import generate_resource_config
+from repodono.model.testing.benchmark import generate_route_table
+from repodono.model.testing.benchmark import measure_build
+from repodono.model.testing.benchmark import measure_latencies
+from repodono.model.testing.benchmark import measure_lookup
+from repodono.model.testing.benchmark import percentile
+from repodono.model.testing.benchmark import report_lookup
+from repodono.model.testing.benchmark import report_resources
+from repodono.model.testing.benchmark import router_target
+from repodono.model.testing.benchmark import run_benchmark
+
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    def test_generate_route_table(self):
+        table = generate_route_table(12)
+        self.assertEqual(12, len(table))
+        router = URITemplateRouter.from_strings(
+            template for template, uri in table)
+        for template, uri in table:
+            route, mapping = router(uri)
+            self.assertEqual(template, route)
+            self.assertEqual(URITemplate(route).expand(**mapping), uri)
+
+    def test_measure_lookup(self):
+        table = generate_route_table(3)
+        router = URITemplateRouter.from_strings(
+            template for template, uri in table)
+        self.assertGreater(
+            measure_lookup(router, [uri for t, uri in table], number=1), 0)
+
+    def test_report_lookup(self):
+        results = report_lookup(route_counts=(3, 6), number=1)
+        self.assertEqual([
+            ('URITemplateRouter', 3),
+            ('CompiledURITemplateRouter', 3),
+            ('PrefixTreeURITemplateRouter', 3),
+            ('URITemplateRouter', 6),
+            ('CompiledURITemplateRouter', 6),
+            ('PrefixTreeURITemplateRouter', 6),
+        ], [(name, count) for name, count, cost in results])
+
+    def test_generate_route_table_kinds(self):
+        table = generate_route_table(4, kinds=('explode',))
+        self.assertEqual([
+            '/api/v1/tree0/{id}{/path*}',
+            '/api/v1/tree1/{id}{/path*}',
+            '/api/v1/tree2/{id}{/path*}',
+            '/api/v1/tree3/{id}{/path*}',
+        ], [template for template, uri in table])
+
+        with self.assertRaises(KeyError):
+            generate_route_table(1, kinds=('unknown',))
+
+    def test_measure_build(self):
+        table = generate_route_table(6)
+        lookup, build_time, memory = measure_build(
+            URITemplateRouter.from_strings, [t for t, uri in table])
+        self.assertTrue(isinstance(lookup, URITemplateRouter))
+        self.assertGreater(build_time, 0)
+        self.assertGreater(memory, 0)
+
+    def test_measure_latencies(self):
+        samples = measure_latencies(len, ['a', 'b', 'c'], number=2)
+        self.assertEqual(6, len(samples))
+        self.assertEqual(sorted(samples), samples)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(1, percentile(samples, 0))
+        self.assertEqual(50, percentile(samples, 50))
+        self.assertEqual(99, percentile(samples, 99))
+        self.assertEqual(100, percentile(samples, 100))
+        self.assertEqual(7, percentile([7], 90))
+        with self.assertRaises(ValueError):
+            percentile([], 50)
+
+    def test_run_benchmark(self):
+        lookups = []
+
+        def build(templates):
+            def lookup(uri):
+                lookups.append(uri)
+            return lookup
+
+        targets = [router_target(URITemplateRouter), Target('dummy', build)]
+        results = run_benchmark(
+            targets=targets, route_counts=(3, 9), number=2, sample_size=4)
+        self.assertEqual([
+            ('URITemplateRouter', 3, 8),
+            ('dummy', 3, 8),
+            ('URITemplateRouter', 9, 10),
+            ('dummy', 9, 10),
+        ], [(r.name, r.count, r.lookups) for r in results])
+        self.assertEqual([50, 90, 99], sorted(results[0].percentiles))
+        # the miss is always looked up last.
+        self.assertEqual('/nowhere', lookups[-1])
+
+        # the order of the lookups is reproducible.
+        first = list(lookups)
+        lookups[:] = []
+        run_benchmark(
+            targets=targets, route_counts=(3, 9), number=2, sample_size=4)
+        self.assertEqual(first, lookups)
+
+    def test_generate_resource_config(self):
+        config = Configuration(generate_resource_config(3))
+        result = config.request_execution('/', {})()
+        self.assertEqual(3, len(result.path))
+        self.assertEqual(['value'] * 3, [thing.path for thing in result.path])
+
+    def test_report_resources(self):
+        results = report_resources(resource_counts=(1, 5), number=1)
+        self.assertEqual([1, 5], [count for count, cost in results])
+        self.assertTrue(all(cost > 0 for count, cost in results))
@@ -0,0 +1,78 @@
+import unittest
+from threading import Thread
+
+from repodono.model.cache import LRUCache
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=-1)
+
+    def test_basic(self):
+        cache = LRUCache(maxsize=2)
+        self.assertIsNone(cache.get('a'))
+        self.assertIs(cache.get('a', NotImplemented), NotImplemented)
+        cache['a'] = 1
+        self.assertEqual(1, cache.get('a'))
+        self.assertIn('a', cache)
+        self.assertEqual(1, len(cache))
+        self.assertEqual((1, 2, 2, 1), cache.info())
+
+    def test_eviction_order(self):
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        # mark a as recently used
+        cache.get('a')
+        cache['c'] = 3
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        # reassignment also marks as recently used
+        cache['a'] = 4
+        cache['d'] = 5
+        self.assertEqual(4, cache.get('a'))
+        self.assertNotIn('c', cache)
+
+    def test_zero_size(self):
+        cache = LRUCache(maxsize=0)
+        cache['a'] = 1
+        self.assertNotIn('a', cache)
+        self.assertEqual(0, len(cache))
+
+    def test_evict_clear(self):
+        cache = LRUCache()
+        cache['a'] = 1
+        cache['b'] = 2
+        cache.get('a')
+        cache.evict('a')
+        cache.evict('missing')
+        self.assertNotIn('a', cache)
+        self.assertEqual((1, 0, 1024, 1), cache.info())
+        cache.clear()
+        self.assertEqual((0, 0, 1024, 0), cache.info())
+
+    def test_no_stats(self):
+        cache = LRUCache(track_stats=False)
+        cache['a'] = 1
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual((0, 0, 1024, 1), cache.info())
+
+    def test_threaded(self):
+        cache = LRUCache(maxsize=8)
+
+        def worker(offset):
+            for i in range(1000):
+                cache[(offset, i % 16)] = i
+                cache.get((offset, (i + 1) % 16))
+
+        threads = [Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(8, len(cache))
+        self.assertEqual(4000, sum(cache.info()[:2]))
@@ -1,13 +1,23 @@
+import asyncio
 import unittest
 from pathlib import Path, PurePath
 from tempfile import TemporaryDirectory
+from threading import Barrier
+from threading import BrokenBarrierError
+from threading import Event
+from threading import active_count
+from threading import get_ident
 
 from repodono.model.exceptions import (
     ExecutionNoResultError,
+    ExecutionTimeoutError,
     MappingReferenceError,
 )
 
+from repodono.model.base import AsyncExecution
+from repodono.model.base import ConcurrentExecution
 from repodono.model.config import Configuration
+from repodono.model.routing import CompiledURITemplateRouter
 
 
 class ConfigEnvironmentTestCase(unittest.TestCase):
@@ -317,6 +327,94 @@ class ConfigIntegrationTestCase(unittest.TestCase):
         self.assertEqual(0, exe.execute())
         self.assertEqual(0, exe())
 
+    def test_flat_environments(self):
+        config = Configuration.from_toml("""
+        [environment.variables]
+        one = "one"
+        two = "two"
+
+        [environment.paths]
+        somewhere = "/"
+
+        [default.variables]
+        two = 2
+        three = 3
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [endpoint._."/"]
+        __provider__ = "one"
+        one = 1
+        four = 4
+        """)
+        self.assertEqual({'two': 2, 'three': 3}, config.flat_default)
+        self.assertEqual({
+            'one': 'one',
+            'two': 'two',
+            'four': 4,
+            'somewhere': Path('/'),
+        }, config.flat_environments[('_', '/')])
+
+        exe = config.request_execution('/', {})
+        endpoint = config.endpoint['_']['/']
+        unflattened = config.execution_class(
+            endpoint, config.environment, config.default,
+            config.compiled_route_resources['/'], {}, {})
+        for key in ('one', 'two', 'three', 'four', 'somewhere', '__route__'):
+            self.assertEqual(unflattened.locals[key], exe.locals[key])
+        self.assertEqual(dict(unflattened.locals), dict(exe.locals))
+        self.assertEqual('one', exe())
+
+    def test_router_class(self):
+        config_str = """
+        [environment.paths]
+        foo = 'bar'
+
+        [bucket._]
+        __roots__ = ["foo"]
+
+        [endpoint._."/"]
+        __provider__ = "foo"
+
+        [endpoint._."/{id}"]
+        __provider__ = "foo"
+        """
+
+        config = Configuration.from_toml(
+            config_str, router_class=CompiledURITemplateRouter)
+        self.assertTrue(isinstance(config.router, CompiledURITemplateRouter))
+        self.assertEqual(['/', '/{id}'], config.endpoint_keys)
+        self.assertEqual(('/{id}', {'id': '1'}), config.router('/1'))
+        # static routes are resolved directly.
+        self.assertEqual(['/'], list(config.router.static_matchers))
+        self.assertEqual(('/', {}), config.router('/'))
+
+    def test_router_cache_dir(self):
+        root = TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        config_str = """
+        [environment.paths]
+        foo = 'bar'
+
+        [bucket._]
+        __roots__ = ["foo"]
+
+        [endpoint._."/{id}"]
+        __provider__ = "foo"
+        """
+
+        config = Configuration.from_toml(
+            config_str, router_cache_dir=root.name)
+        self.assertEqual(1, len(list(Path(root.name).iterdir())))
+        self.assertEqual(('/{id}', {'id': '1'}), config.router('/1'))
+        config = Configuration.from_toml(
+            config_str, router_cache_dir=root.name,
+            router_options={'lazy': True})
+        self.assertIsNone(config.router.matchers[0]._regex_pattern)
+        self.assertEqual(1, len(list(Path(root.name).iterdir())))
+        self.assertEqual(('/{id}', {'id': '1'}), config.router('/1'))
+
     def test_compiled_details(self):
         root = TemporaryDirectory()
         self.addCleanup(root.cleanup)
@@ -522,6 +620,101 @@ class ConfigIntegrationTestCase(unittest.TestCase):
                     'accept': 'application/json',
                 })
 
+    def test_route_endpoints(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        base_root = "/"
+        json_root = "/"
+
+        [bucket._]
+        __roots__ = ["base_root"]
+
+        [bucket.json]
+        __roots__ = ["json_root"]
+        accept = ["application/json"]
+
+        [endpoint._."/entry"]
+        __provider__ = "entry_html"
+
+        [endpoint.json."/entry"]
+        __provider__ = "entry_json"
+
+        [endpoint.json."/entry.json"]
+        __provider__ = "entry_json"
+        """)
+        self.assertEqual(
+            ['_', 'json'], sorted(config.route_endpoints['/entry']))
+        self.assertEqual(['json'], list(config.route_endpoints['/entry.json']))
+        self.assertIs(
+            config.endpoint['json']['/entry'],
+            config.route_endpoints['/entry']['json'])
+
+        self.assertEqual('entry_json', config.route_bucket_endpoint_resolver(
+            '/entry', {'accept': 'application/json'}).name)
+        self.assertEqual('entry_json', config.route_bucket_endpoint_resolver(
+            '/entry', {'accept': 'application/json;q=0.9'}).name)
+        self.assertEqual('entry_html', config.route_bucket_endpoint_resolver(
+            '/entry', {'accept': 'application/json;q=0'}).name)
+        self.assertEqual('entry_html', config.route_bucket_endpoint_resolver(
+            '/entry').name)
+        with self.assertRaises(KeyError):
+            config.route_bucket_endpoint_resolver('/entry.json')
+        with self.assertRaises(KeyError):
+            config.route_bucket_endpoint_resolver('/nowhere')
+
+    def test_dispatch(self):
+        config = Configuration.from_toml("""
+        [environment.variables]
+        value = "value"
+
+        [environment.paths]
+        base_root = "/"
+        json_root = "/"
+
+        [bucket._]
+        __roots__ = ["base_root"]
+
+        [bucket.json]
+        __roots__ = ["json_root"]
+        accept = ["application/json"]
+
+        [[resource."/entry/{entry_id}"]]
+        __name__ = "entry"
+        __init__ = "repodono.model.testing:Thing"
+        path = "entry_id"
+
+        [localmap."/entry/{entry_id}"]
+        item = "entry"
+
+        [endpoint._."/entry/{entry_id}"]
+        __provider__ = "entry"
+
+        [endpoint.json."/entry/{entry_id}"]
+        __provider__ = "entry"
+        format = "json"
+        """)
+        route_plan = config.route_plans['/entry/{entry_id}']
+        self.assertEqual('/entry/{entry_id}', route_plan.route)
+        self.assertEqual(['_', 'json'], sorted(route_plan.endpoints))
+        self.assertEqual({'item': 'entry'}, dict(route_plan.remap))
+
+        exe = config.dispatch('/entry/123')
+        self.assertEqual('/entry/{entry_id}', exe.locals['__route__'])
+        self.assertEqual('123', exe().path)
+        self.assertEqual('_', exe.endpoint.bucket_name)
+
+        exe = config.dispatch('/entry/123', {'accept': 'application/json'})
+        self.assertEqual('json', exe.endpoint.bucket_name)
+        self.assertEqual('json', exe.locals['format'])
+        self.assertEqual('123', exe.locals['item'].path)
+
+        exe = config.dispatch(
+            '/entry/123', execution_class=AsyncExecution)
+        self.assertIsInstance(exe, AsyncExecution)
+
+        with self.assertRaises(KeyError):
+            config.dispatch('/nowhere')
+
     def test_endpoint_kwargs_indirection(self):
         config = Configuration.from_toml("""
         [environment.variables]
@@ -556,6 +749,456 @@ class ConfigIntegrationTestCase(unittest.TestCase):
         self.assertEqual(exe.locals['a_mock'].mock_method, 'blah')
         self.assertEqual(exe.locals['a_mock'].mock_thing, 'env')
 
+    def test_resource_plan(self):
+        config = Configuration.from_toml("""
+        [environment.variables]
+        shadowed = "env"
+
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "first"
+        __init__ = "repodono.model.testing:Thing"
+        path = "shadowed"
+
+        [[resource."/"]]
+        __name__ = "second"
+        __init__ = "repodono.model.testing:Thing"
+        path = "first"
+
+        [[resource."/"]]
+        __name__ = "unused"
+        __init__ = "repodono.model.testing:Die"
+
+        [[resource."/"]]
+        __name__ = "shadowed"
+        __init__ = "repodono.model.testing:Die"
+
+        [[resource."/"]]
+        __name__ = "provider"
+        __init__ = "repodono.model.testing:Thing"
+        path = "unused"
+
+        [endpoint._."/"]
+        __provider__ = "provider"
+        __kwargs__.path = "second"
+        """)
+        plan = (('first',), ('second',))
+        self.assertEqual(plan, config.resource_plans[('_', '/')])
+
+        exe = config.request_execution('/', {})
+        self.assertEqual(plan, exe.resource_plan)
+        result = exe()
+        self.assertEqual('env', result.path.path.path)
+        self.assertIs(result.path, exe.locals['second'])
+
+    def test_concurrent_execution(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "first"
+        __call__ = "wait"
+        value = "'first'"
+
+        [[resource."/"]]
+        __name__ = "second"
+        __call__ = "wait"
+        value = "'second'"
+
+        [[resource."/"]]
+        __name__ = "provider"
+        __init__ = "repodono.model.testing:Thing"
+        path = ["first", "second"]
+
+        [endpoint._."/"]
+        __provider__ = "provider"
+        """)
+        self.assertEqual(
+            (('first', 'second'),), config.resource_plans[('_', '/')])
+
+        # both resources must be resolved at the same time to pass.
+        barrier = Barrier(2, timeout=5)
+
+        def wait(value):
+            barrier.wait()
+            return value
+
+        exe = config.request_execution(
+            '/', {'wait': wait}, execution_class=ConcurrentExecution)
+        self.assertEqual(['first', 'second'], exe().path)
+
+        # the serial version will break the barrier.
+        barrier = Barrier(2, timeout=0.01)
+        exe = config.request_execution('/', {'wait': wait})
+        with self.assertRaises(BrokenBarrierError):
+            exe()
+
+    def test_concurrent_execution_error(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "first"
+        __init__ = "repodono.model.testing:Die"
+
+        [[resource."/"]]
+        __name__ = "second"
+        __init__ = "repodono.model.testing:Thing"
+        path = "'second'"
+
+        [[resource."/"]]
+        __name__ = "provider"
+        __init__ = "repodono.model.testing:Thing"
+        path = ["first", "second"]
+
+        [endpoint._."/"]
+        __provider__ = "provider"
+        """)
+        exe = config.request_execution(
+            '/', {}, execution_class=ConcurrentExecution)
+        with self.assertRaises(Exception) as e:
+            exe()
+        self.assertEqual(
+            'instantiation of this class is forbidden', e.exception.args[0])
+
+    def test_async_execution(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "first"
+        __call__ = "fetch"
+        value = "'first'"
+
+        [[resource."/"]]
+        __name__ = "second"
+        __call__ = "fetch"
+        value = "'second'"
+
+        [[resource."/"]]
+        __name__ = "combined"
+        __init__ = "repodono.model.testing:Thing"
+        path = ["first", "second"]
+
+        [[resource."/"]]
+        __name__ = "provider"
+        __call__ = "fetch"
+        value = "combined"
+
+        [endpoint._."/"]
+        __provider__ = "provider.path"
+        """)
+        log = []
+
+        async def fetch(value):
+            log.append(('start', value))
+            await asyncio.sleep(0)
+            log.append(('end', value))
+            return value
+
+        exe = config.request_execution(
+            '/', {'fetch': fetch}, execution_class=AsyncExecution)
+        result = asyncio.run(exe())
+        self.assertEqual(['first', 'second'], result)
+        # the provider is awaited and memoized.
+        self.assertEqual(['first', 'second'], exe.locals['provider'].path)
+        self.assertEqual([
+            ('start', 'first'),
+            ('start', 'second'),
+            ('end', 'first'),
+            ('end', 'second'),
+            ('start', exe.locals['provider']),
+            ('end', exe.locals['provider']),
+        ], log)
+
+    def test_async_execution_not_none(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "value"
+        __call__ = "fetch"
+
+        [endpoint._."/"]
+        __provider__ = "value"
+        __notnone__ = ["value"]
+        """)
+
+        async def fetch_none():
+            return None
+
+        exe = config.request_execution(
+            '/', {'fetch': fetch_none}, execution_class=AsyncExecution)
+        with self.assertRaises(ExecutionNoResultError) as e:
+            asyncio.run(exe())
+        self.assertIn(
+            "'value' unexpectedly resolved to None", e.exception.args[0])
+
+    def test_async_execution_provider(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [endpoint._."/"]
+        __provider__ = "fetch"
+        """)
+
+        async def fetch():
+            return 'result'
+
+        exe = config.request_execution(
+            '/', {'fetch': fetch()}, execution_class=AsyncExecution)
+        self.assertEqual('result', asyncio.run(exe()))
+
+    timeout_config = """
+    [environment.paths]
+    somewhere = "/"
+
+    [bucket._]
+    __roots__ = ['somewhere']
+
+    [[resource."/"]]
+    __name__ = "slow"
+    __call__ = "slow_call"
+
+    [[resource."/"]]
+    __name__ = "after"
+    __call__ = "after_call"
+    slow = "slow"
+
+    [endpoint._."/"]
+    __provider__ = "after"
+    __timeout__ = 0.05
+
+    [endpoint._."/fast"]
+    __provider__ = "fast"
+    __timeout__ = 5
+    """
+
+    def test_execution_timeout(self):
+        config = Configuration.from_toml(self.timeout_config)
+        event = Event()
+        threads = []
+        resolved = []
+
+        def slow():
+            threads.append(get_ident())
+            event.wait(0.1)
+            return 'slow'
+
+        def after(slow):
+            resolved.append(slow)
+            return slow
+
+        exe = config.request_execution('/', {
+            'slow_call': slow, 'after_call': after})
+        with self.assertRaises(ExecutionTimeoutError) as e:
+            exe()
+        self.assertEqual(
+            "execution of end point in bucket '_' with route '/' exceeded "
+            "the timeout of 0.05 seconds", e.exception.args[0])
+        # the execution was done on the calling thread, and it did not
+        # proceed any further past the deadline.
+        self.assertEqual([get_ident()], threads)
+        self.assertEqual([], resolved)
+
+        exe = config.request_execution('/fast', {'fast': 'fast'})
+        self.assertEqual('fast', exe())
+        exe = config.request_execution('/fast', {'fast': None})
+        with self.assertRaises(ExecutionNoResultError):
+            exe()
+
+    def test_execution_timeout_provider(self):
+        config = Configuration.from_toml(self.timeout_config)
+        event = Event()
+
+        def after(slow):
+            event.wait(0.1)
+            return slow
+
+        count = active_count()
+        for _ in range(5):
+            exe = config.request_execution('/', {
+                'slow_call': lambda: 'slow', 'after_call': after})
+            # the provider is not interrupted, but its result is
+            # rejected as the deadline has passed.
+            with self.assertRaises(ExecutionTimeoutError):
+                exe()
+        # no threads are left behind by the abandoned executions.
+        self.assertEqual(count, active_count())
+
+    def test_async_execution_timeout(self):
+        config = Configuration.from_toml(self.timeout_config)
+
+        async def slow():
+            await asyncio.sleep(5)
+
+        async def fast():
+            return 'fast'
+
+        exe = config.request_execution(
+            '/', {'slow_call': slow, 'after_call': None},
+            execution_class=AsyncExecution)
+        with self.assertRaises(ExecutionTimeoutError):
+            asyncio.run(exe())
+
+        exe = config.request_execution(
+            '/fast', {'fast': fast()}, execution_class=AsyncExecution)
+        self.assertEqual('fast', asyncio.run(exe()))
+
+        async def own_timeout():
+            raise TimeoutError('resource timed out')
+
+        # a timeout raised by the execution itself is not converted.
+        exe = config.request_execution(
+            '/fast', {'fast': own_timeout()}, execution_class=AsyncExecution)
+        with self.assertRaises(TimeoutError) as e:
+            asyncio.run(exe())
+        self.assertNotIsInstance(e.exception, ExecutionTimeoutError)
+        self.assertEqual('resource timed out', e.exception.args[0])
+
+    def test_resource_cycle(self):
+        with self.assertRaises(MappingReferenceError) as e:
+            Configuration.from_toml("""
+            [environment.paths]
+            somewhere = "/"
+
+            [bucket._]
+            __roots__ = ['somewhere']
+
+            [[resource."/"]]
+            __name__ = "first"
+            __init__ = "repodono.model.testing:Thing"
+            path = "second"
+
+            [[resource."/"]]
+            __name__ = "second"
+            __init__ = "repodono.model.testing:Thing"
+            path = "first.path"
+
+            [endpoint._."/"]
+            __provider__ = "first"
+            """)
+
+        self.assertEqual(
+            "cyclic reference between resources: first -> second -> first; "
+            "for end point in bucket '_' with route '/'", e.exception.args[0])
+
+    def test_resource_plan_localmap(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "shared"
+        __call__ = "make"
+
+        [[resource."/"]]
+        __name__ = "a"
+        __init__ = "repodono.model.testing:Thing"
+        path = "alias"
+
+        [[resource."/"]]
+        __name__ = "b"
+        __init__ = "repodono.model.testing:Thing"
+        path = "alias"
+
+        [[resource."/"]]
+        __name__ = "provider"
+        __init__ = "repodono.model.testing:Thing"
+        path = ["a", "b"]
+
+        [localmap."/"]
+        alias = "shared"
+
+        [endpoint._."/"]
+        __provider__ = "provider"
+        """)
+        # the localmap alias is followed through to the resource.
+        self.assertEqual(
+            (('shared',), ('a', 'b')), config.resource_plans[('_', '/')])
+
+        calls = []
+
+        def make():
+            calls.append(None)
+            return object()
+
+        exe = config.request_execution(
+            '/', {'make': make}, execution_class=ConcurrentExecution)
+        a, b = exe().path
+        self.assertEqual(1, len(calls))
+        self.assertIs(a.path, b.path)
+
+        async def amake():
+            calls.append(None)
+            return object()
+
+        calls.clear()
+        exe = config.request_execution(
+            '/', {'make': amake}, execution_class=AsyncExecution)
+        a, b = asyncio.run(exe()).path
+        self.assertEqual(1, len(calls))
+        self.assertIs(a.path, b.path)
+        self.assertIs(exe.locals['shared'], a.path)
+
+    def test_resource_cycle_localmap(self):
+        with self.assertRaises(MappingReferenceError) as e:
+            Configuration.from_toml("""
+            [environment.paths]
+            somewhere = "/"
+
+            [bucket._]
+            __roots__ = ['somewhere']
+
+            [[resource."/"]]
+            __name__ = "first"
+            __init__ = "repodono.model.testing:Thing"
+            path = "alias"
+
+            [[resource."/"]]
+            __name__ = "second"
+            __init__ = "repodono.model.testing:Thing"
+            path = "first"
+
+            [localmap."/"]
+            alias.nested = "second"
+
+            [endpoint._."/"]
+            __provider__ = "first"
+            """)
+
+        self.assertEqual(
+            "cyclic reference between resources: first -> second -> first; "
+            "for end point in bucket '_' with route '/'", e.exception.args[0])
+
     def test_endpoint_kwargs_nested_remap(self):
         config = Configuration.from_toml("""
         [environment.variables]
@@ -1,9 +1,11 @@
+import asyncio
 import unittest
 from os.path import exists
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
 from repodono.model.http import Response, HttpExecution
+from repodono.model.http import AsyncHttpExecution
 from repodono.model.config import Configuration
 from repodono.model.exceptions import ExecutionNoResultError
 
@@ -281,3 +283,33 @@ class HttpExecutionTestCase(unittest.TestCase):
         response = config.request_execution('/constructed', {})()
         self.assertEqual(b'hello', response.content)
         self.assertEqual({}, response.headers)
+
+    def test_async_execution(self):
+        std_root = TemporaryDirectory()
+        self.addCleanup(std_root.cleanup)
+
+        config = Configuration.from_toml("""
+        [environment.paths]
+        std_root = %r
+
+        [bucket._]
+        __roots__ = ['std_root']
+        accept = ["*/*"]
+
+        [[resource."/"]]
+        __name__ = "result"
+        __call__ = "fetch"
+
+        [endpoint._."/"]
+        __provider__ = "result"
+        """ % (std_root.name,), execution_class=AsyncHttpExecution)
+
+        async def fetch():
+            return {'result': 'async'}
+
+        exe = config.request_execution('/', {'fetch': fetch})
+        response = asyncio.run(exe())
+        self.assertEqual(b'{"result": "async"}', response.content)
+        self.assertEqual({
+            'content-type': 'application/json',
+        }, response.headers)
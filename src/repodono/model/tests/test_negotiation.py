@@ -0,0 +1,59 @@
+import unittest
+
+from repodono.model.cache import LRUCache
+from repodono.model.negotiation import cached_parse_qvalues
+from repodono.model.negotiation import parse_qvalues
+from repodono.model.negotiation import score_value
+
+
+class ParseQValuesTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual((), parse_qvalues(''))
+        self.assertEqual((('text/html', 1.0),), parse_qvalues('text/html'))
+        self.assertEqual((
+            ('text/html', 1.0),
+            ('application/xhtml+xml', 0.9),
+            ('*/*', 0.8),
+        ), parse_qvalues(
+            'text/html, application/xhtml+xml;q=0.9, */*;q=0.8'))
+
+    def test_parse_params(self):
+        self.assertEqual((
+            ('text/plain', 0.5),
+            ('text/html', 1.0),
+            ('text/xml', 0.0),
+            ('text/json', 1.0),
+        ), parse_qvalues(
+            'text/plain; charset=utf-8; Q=0.5,,text/html;q=bad,'
+            'text/xml;q=-1,text/json;q=2'))
+
+    def test_cached(self):
+        cache = LRUCache()
+        result = cached_parse_qvalues('en-NZ, en;q=0.5', cache=cache)
+        self.assertEqual((('en-NZ', 1.0), ('en', 0.5)), result)
+        self.assertIs(result, cached_parse_qvalues(
+            'en-NZ, en;q=0.5', cache=cache))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(result, cached_parse_qvalues(
+            'en-NZ, en;q=0.5', cache=None))
+
+
+class ScoreValueTestCase(unittest.TestCase):
+
+    def test_score(self):
+        accepted = ['text/xml', 'application/xml']
+        self.assertEqual(1, score_value('text/xml', accepted))
+        self.assertEqual(0, score_value('text/html', accepted))
+        self.assertEqual(0.5, score_value(
+            'text/html, text/xml;q=0.5', accepted))
+        self.assertEqual(0.7, score_value(
+            'text/xml;q=0.5, application/xml;q=0.7', accepted))
+        self.assertEqual(0, score_value('text/xml;q=0', accepted))
+        # wildcards are not expanded.
+        self.assertEqual(0, score_value('*/*', accepted))
+
+    def test_score_non_string(self):
+        self.assertEqual(1, score_value(1, [1, 2]))
+        self.assertEqual(0, score_value(3, [1, 2]))
+        self.assertEqual(0, score_value(['text/xml'], {'text/xml'}))
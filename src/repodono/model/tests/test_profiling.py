@@ -0,0 +1,201 @@
+import asyncio
+import unittest
+from functools import partial
+
+from repodono.model.base import AsyncExecution
+from repodono.model.base import Execution
+from repodono.model.config import Configuration
+from repodono.model.profiling import ExecutionTracer
+from repodono.model.profiling import TraceAggregator
+
+config_toml = """
+[environment.variables]
+value = "value"
+
+[environment.paths]
+somewhere = "/"
+
+[bucket._]
+__roots__ = ['somewhere']
+
+[[resource."/"]]
+__name__ = "inner"
+__init__ = "repodono.model.testing:Thing"
+path = "value"
+
+[[resource."/"]]
+__name__ = "outer"
+__init__ = "repodono.model.testing:Thing"
+path = "inner"
+
+[endpoint._."/"]
+__provider__ = "outer"
+"""
+
+
+class ExecutionTracerTestCase(unittest.TestCase):
+
+    def test_nesting(self):
+        tracer = ExecutionTracer()
+        with tracer('resource', 'outer'):
+            with tracer('resource', 'inner'):
+                pass
+        with tracer('provider', 'outer'):
+            pass
+        report = tracer.report()
+        self.assertEqual([
+            ('resource', 'outer', 0, None),
+            ('resource', 'inner', 1, 'outer'),
+            ('provider', 'outer', 0, None),
+        ], [(
+            record['kind'], record['name'], record['depth'], record['parent'],
+        ) for record in report])
+        self.assertTrue(all(record['duration'] >= 0 for record in report))
+
+    def test_error(self):
+        tracer = ExecutionTracer()
+        with self.assertRaises(ValueError):
+            with tracer('resource', 'broken'):
+                raise ValueError('broken')
+        self.assertEqual(['broken'], [r['name'] for r in tracer.report()])
+        # the stack is unwound.
+        with tracer('resource', 'next'):
+            pass
+        self.assertIsNone(tracer.report()[-1]['parent'])
+
+    def test_summary(self):
+        tracer = ExecutionTracer()
+        for _ in range(3):
+            with tracer('resource', 'thing'):
+                pass
+        summary, = tracer.summary()
+        self.assertEqual('resource', summary['kind'])
+        self.assertEqual('thing', summary['name'])
+        self.assertEqual(3, summary['count'])
+        self.assertAlmostEqual(summary['total'] / 3, summary['mean'])
+        self.assertLessEqual(summary['max'], summary['total'])
+
+
+class TraceAggregatorTestCase(unittest.TestCase):
+
+    def test_aggregate(self):
+        aggregator = TraceAggregator()
+        aggregator.add('resource', 'a', 1.0)
+        aggregator.add('resource', 'a', 3.0)
+        aggregator.add('provider', 'b', 5.0)
+        self.assertEqual([{
+            'kind': 'provider', 'name': 'b', 'count': 1,
+            'total': 5.0, 'mean': 5.0, 'max': 5.0,
+        }, {
+            'kind': 'resource', 'name': 'a', 'count': 2,
+            'total': 4.0, 'mean': 2.0, 'max': 3.0,
+        }], aggregator.report())
+        aggregator.clear()
+        self.assertEqual([], aggregator.report())
+
+    def test_update(self):
+        tracer = ExecutionTracer()
+        with tracer('resource', 'a'):
+            pass
+        aggregator = TraceAggregator()
+        aggregator.update(tracer)
+        aggregator.update(tracer)
+        self.assertEqual(2, aggregator.report()[0]['count'])
+
+
+class ExecutionProfilingTestCase(unittest.TestCase):
+
+    def test_execution(self):
+        config = Configuration.from_toml(config_toml)
+        tracer = ExecutionTracer()
+        exe = config.request_execution('/', {})
+        self.assertIsNone(exe.tracer)
+        exe = Execution(
+            exe.endpoint, exe.environment, exe.default, exe.resources,
+            {}, {}, resource_plan=exe.resource_plan, tracer=tracer)
+        exe()
+        # the dependencies of the provider are resolved ahead of it, with
+        # the resource for the provider itself resolved through the call.
+        self.assertEqual([
+            ('resource', 'inner', 0, None),
+            ('provider', 'outer', 0, None),
+            ('resource', 'outer', 1, 'outer'),
+        ], [(
+            record['kind'], record['name'], record['depth'], record['parent'],
+        ) for record in tracer.report()])
+
+    def test_async_execution(self):
+        config = Configuration.from_toml("""
+        [environment.paths]
+        somewhere = "/"
+
+        [bucket._]
+        __roots__ = ['somewhere']
+
+        [[resource."/"]]
+        __name__ = "first"
+        __call__ = "slow"
+
+        [[resource."/"]]
+        __name__ = "second"
+        __call__ = "slow"
+
+        [[resource."/"]]
+        __name__ = "provider"
+        __init__ = "repodono.model.testing:Thing"
+        path = ["first", "second"]
+
+        [endpoint._."/"]
+        __provider__ = "provider"
+        """)
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return 'slow'
+
+        tracer = ExecutionTracer()
+        exe = config.request_execution('/', {'slow': slow})
+        exe = AsyncExecution(
+            exe.endpoint, exe.environment, exe.default, exe.resources,
+            {'slow': slow}, {}, resource_plan=exe.resource_plan,
+            tracer=tracer)
+        self.assertEqual(['slow', 'slow'], asyncio.run(exe()).path)
+        awaits = {
+            record['name']: record for record in tracer.report()
+            if record['kind'] == 'await'
+        }
+        self.assertEqual(['first', 'second'], sorted(awaits))
+        for record in awaits.values():
+            # the time spent awaiting is attributed to the resources,
+            # with the concurrent awaits not nested within each other.
+            self.assertGreaterEqual(record['duration'], 0.04)
+            self.assertEqual(0, record['depth'])
+            self.assertIsNone(record['parent'])
+
+    def test_tracer_factory(self):
+        aggregator = TraceAggregator()
+
+        class ProfiledExecution(Execution):
+            tracer_factory = partial(ExecutionTracer, aggregator=aggregator)
+
+        class AsyncProfiledExecution(AsyncExecution):
+            tracer_factory = partial(ExecutionTracer, aggregator=aggregator)
+
+        config = Configuration.from_toml(
+            config_toml, execution_class=ProfiledExecution)
+        first = config.request_execution('/', {})
+        second = config.request_execution('/', {})
+        self.assertIsNot(first.tracer, second.tracer)
+        first()
+        second()
+        asyncio.run(config.request_execution(
+            '/', {}, execution_class=AsyncProfiledExecution)())
+        self.assertEqual(3, len(first.tracer.report()))
+        self.assertEqual({
+            ('resource', 'outer'): 3,
+            ('resource', 'inner'): 3,
+            ('provider', 'outer'): 3,
+        }, {
+            (entry['kind'], entry['name']): entry['count']
+            for entry in aggregator.report()
+        })
@@ -1,16 +1,27 @@
+import json
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 from uritemplate import URITemplate
+from repodono.model.cache import LRUCache
 from repodono.model.routing import URITemplateRouter
+from repodono.model.routing import CompiledURITemplateRouter
+from repodono.model.routing import PrefixTreeURITemplateRouter
+from repodono.model.routing import StaticPrefixTree
+from repodono.model.routing import template_literal_prefix
 
 
 class URITemplateRouterTestCase(unittest.TestCase):
 
+    router_class = URITemplateRouter
+
     def test_unacceptable_route(self):
         # TODO decide whether failing all routes because one route has
         # failed is intended.
         with self.assertRaises(ValueError):
-            URITemplateRouter([
+            self.router_class([
                 URITemplate('{target}'),
                 URITemplate('/{target}'),
             ])
@@ -37,7 +48,7 @@ class URITemplateRouterTestCase(unittest.TestCase):
             self.assertRouting('', 'good', {})
 
     def test_standard_construction(self):
-        self.router = URITemplateRouter([
+        self.router = self.router_class([
             URITemplate('/e/{target}'),
             URITemplate('/e/{target}{/path*}'),
             URITemplate('/e/{target}{/path*}/alternate/{view}'),
@@ -107,7 +118,7 @@ class URITemplateRouterTestCase(unittest.TestCase):
         )
 
     def test_from_list_of_strings(self):
-        self.router = URITemplateRouter.from_strings([
+        self.router = self.router_class.from_strings([
             '/e/{target}',
             '/e/{target}{/path*}',
             '/e/{target}{/path*}/alternate/{view}',
@@ -130,3 +141,396 @@ class URITemplateRouterTestCase(unittest.TestCase):
                 'path': ['path', 'to', 'the'],
             }
         )
+
+    def test_shared_variable_names(self):
+        self.router = self.router_class.from_strings([
+            '/{target}/view',
+            '/{target}/{action}',
+            '/{target}{/path*}',
+        ])
+
+        self.assertRouting(
+            '/some_target/view',
+            '/{target}/view', {
+                'target': 'some_target',
+            }
+        )
+
+        self.assertRouting(
+            '/some_target/edit',
+            '/{target}/{action}', {
+                'target': 'some_target',
+                'action': 'edit',
+            }
+        )
+
+        self.assertRouting(
+            '/some_target/edit/more',
+            '/{target}{/path*}', {
+                'target': 'some_target',
+                'path': ['edit', 'more'],
+            }
+        )
+
+    def test_static_routes(self):
+        self.router = self.router_class.from_strings([
+            '/',
+            '/about',
+            '/{page}',
+        ])
+        self.assertRouting('/', '/', {})
+        self.assertRouting('/about', '/about', {})
+        self.assertRouting('/contact', '/{page}', {'page': 'contact'})
+        self.assertIsNone(self.router('/about/'))
+
+    def test_static_lookup(self):
+        router = self.router_class.from_strings([
+            '/',
+            '/about',
+            '/about',
+            '/file.txt',
+            '/{page}',
+            '/search{?q}',
+        ])
+        self.assertEqual(['/', '/about'], sorted(router.static_matchers))
+        self.assertEqual([
+            '/file.txt',
+            '/search{?q}',
+            '/{page}',
+        ], [matcher.template.uri for matcher in router.dynamic_matchers])
+        self.assertEqual(6, len(router.matchers))
+
+    def test_empty(self):
+        self.router = self.router_class([])
+        self.assertIsNone(self.router('/'))
+        self.assertIsNone(self.router(''))
+
+    def test_query_variable_ignored(self):
+        self.router = self.router_class.from_strings([
+            '/{root}/somewhere{?hello}',
+        ])
+        self.assertEqual(
+            ('/{root}/somewhere{?hello}', {'root': 'value'}),
+            self.router('/value/somewhere'),
+        )
+
+    def test_consistent_with_naive_router(self):
+        templates = [
+            '/',
+            '/e/{target}',
+            '/e/{target}{/path*}',
+            '/e/{target}{/path*}/alternate/{view}',
+            '/w/{target}{/path*}',
+            '/w/{target}{/path*}/view',
+            '/w/{target}{/path*}/index',
+            '/w/{target}{/path*}/',
+            '/{root}/view',
+            '/{root}/{view}',
+            '{/path*}',
+            '/file.txt',
+            '/a.b/{id}',
+        ]
+        uris = [
+            '/',
+            '/e/target',
+            '/e/target/',
+            '/e/target/a/b/c',
+            '/e/target/a/alternate/b',
+            '/e/target/alternate/b',
+            '/w/target',
+            '/w/target/view',
+            '/w/target/a/b/index',
+            '/w/target/a/b/',
+            '/x/view',
+            '/x/y',
+            '/x/y/z',
+            '',
+            'nowhere',
+            '/file.txt',
+            '/fileXtxt',
+            '/aXb/1',
+        ]
+        naive = URITemplateRouter.from_strings(templates)
+        compiled = self.router_class.from_strings(templates)
+        for uri in uris:
+            self.assertEqual(naive(uri), compiled(uri), uri)
+
+    def test_cached(self):
+        cache = LRUCache(maxsize=2)
+        router = self.router_class.from_strings([
+            '/',
+            '/e/{target}{/path*}',
+        ], cache=cache)
+
+        route, mapping = router('/e/target/a/b')
+        self.assertEqual('/e/{target}{/path*}', route)
+        self.assertEqual({
+            'target': 'target',
+            'path': ('a', 'b'),
+        }, mapping)
+        self.assertEqual((0, 1, 2, 1), cache.info())
+
+        # the same results are returned from the cache.
+        self.assertIs(mapping, router('/e/target/a/b')[1])
+        self.assertEqual((1, 1, 2, 1), cache.info())
+
+        # and cannot be modified.
+        with self.assertRaises(TypeError):
+            mapping['target'] = 'poisoned'
+        with self.assertRaises(AttributeError):
+            mapping['path'].append('poisoned')
+
+        # misses are cached also.
+        self.assertIsNone(router('/nowhere'))
+        self.assertIsNone(router('/nowhere'))
+        self.assertEqual((2, 2, 2, 2), cache.info())
+
+        # least recently used evicted.
+        self.assertEqual(('/', {}), router('/'))
+        self.assertNotIn('/e/target/a/b', cache)
+        self.assertIn('/nowhere', cache)
+        self.assertIn('/', cache)
+
+    def test_expand_cached_result(self):
+        router = self.router_class.from_strings([
+            '/e/{target}{/path*}',
+        ], cache=LRUCache())
+        route, mapping = router('/e/target/a/b')
+        self.assertEqual(
+            URITemplate(route).expand(**mapping), '/e/target/a/b')
+
+    def test_map(self):
+        router = self.router_class.from_strings([
+            '/',
+            '/e/{target}{/path*}',
+        ], cache=LRUCache())
+        uris = ['/', '/e/a/b', '/nowhere', '/e/a/b', '/e/c'] * 3
+        expected = [router.route(uri) for uri in uris]
+        self.assertEqual(expected, list(router.map(uris)))
+        self.assertEqual(expected, list(router.map(iter(uris), chunksize=2)))
+        self.assertEqual([], list(router.map([])))
+        # cache is bypassed.
+        self.assertEqual(0, len(router.cache))
+
+    def test_map_processes(self):
+        router = self.router_class.from_strings([
+            '/',
+            '/e/{target}{/path*}',
+        ])
+        uris = ['/', '/e/a/b', '/nowhere', '/e/c'] * 5
+        self.assertEqual(
+            [router(uri) for uri in uris],
+            list(router.map(uris, processes=2, chunksize=3)),
+        )
+
+        consumed = []
+
+        def generate():
+            for idx in range(1000):
+                consumed.append(idx)
+                yield '/e/%d' % idx
+
+        results = router.map(generate(), processes=2, chunksize=10)
+        self.assertEqual(router.route('/e/0'), next(results))
+        # only up to the prefetched chunks are consumed.
+        self.assertLessEqual(len(consumed), 2 * 2 * 10 + 10)
+        self.assertEqual(999, len(list(results)))
+        self.assertEqual(1000, len(consumed))
+
+    def test_route_chunk_copies(self):
+        router = self.router_class.from_strings([
+            '/e/{target}{/path*}',
+        ])
+        results = router.route_chunk(['/e/a/b', '/e/a/b', '/nowhere'] * 2)
+        self.assertEqual(
+            [router.route('/e/a/b')] * 2 + [None] +
+            [router.route('/e/a/b')] * 2 + [None], results)
+        results[0][1]['path'].append('c')
+        results[0][1]['target'] = 'z'
+        self.assertEqual(('/e/{target}{/path*}', {
+            'target': 'a', 'path': ['b']}), results[1])
+        self.assertIsNot(results[1][1], results[3][1])
+
+    def test_state(self):
+        templates = [
+            '/',
+            '/e/{target}',
+            '/e/{target}{/path*}',
+            '/e/{target}{/path*}/alternate/{view}',
+        ]
+        original = self.router_class.from_strings(templates)
+        self.router = self.router_class.from_state(
+            json.loads(json.dumps(original.to_state())))
+        self.assertEqual(type(original), type(self.router))
+        self.assertEqual([
+            matcher.template.uri for matcher in original.matchers
+        ], [
+            matcher.template.uri for matcher in self.router.matchers
+        ])
+        self.assertRouting('/', '/', {})
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+        self.assertRouting(
+            '/e/t/a/alternate/v', '/e/{target}{/path*}/alternate/{view}', {
+                'target': 't',
+                'path': ['a'],
+                'view': 'v',
+            }
+        )
+
+        with self.assertRaises(ValueError):
+            self.router_class.from_state({'version': None, 'matchers': []})
+
+    def test_from_strings_cached(self):
+        root = TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        cache_dir = Path(root.name) / 'cache'
+        templates = ['/', '/e/{target}']
+
+        self.router = self.router_class.from_strings_cached(
+            templates, cache_dir)
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+        paths = list(cache_dir.iterdir())
+        self.assertEqual(1, len(paths))
+        self.assertEqual(
+            json.loads(json.dumps(self.router.to_state())),
+            json.loads(paths[0].read_text()),
+        )
+
+        # order of the strings does not matter.
+        self.router = self.router_class.from_strings_cached(
+            reversed(templates), cache_dir)
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+        self.assertEqual(1, len(list(cache_dir.iterdir())))
+
+        # the persisted state is used.
+        with patch.object(self.router_class, 'from_strings') as from_strings:
+            self.router = self.router_class.from_strings_cached(
+                templates, cache_dir)
+        self.assertFalse(from_strings.called)
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+
+        # a corrupted file will be replaced.
+        paths[0].write_text('{')
+        with self.assertLogs('repodono.model.routing', level='WARNING'):
+            self.router = self.router_class.from_strings_cached(
+                templates, cache_dir)
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+        self.assertEqual(
+            json.loads(json.dumps(self.router.to_state())),
+            json.loads(paths[0].read_text()),
+        )
+
+        # valid json that is not a state will also be replaced.
+        paths[0].write_text('[]')
+        with self.assertLogs('repodono.model.routing', level='WARNING'):
+            self.router = self.router_class.from_strings_cached(
+                templates, cache_dir)
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+
+        # likewise for a state with a pattern that cannot be compiled.
+        state = json.loads(paths[0].read_text())
+        for matcher_state in state['matchers']:
+            matcher_state['pattern'] = '/a('
+        paths[0].write_text(json.dumps(state))
+        with self.assertLogs('repodono.model.routing', level='WARNING'):
+            self.router = self.router_class.from_strings_cached(
+                templates, cache_dir)
+        self.assertRouting('/e/t', '/e/{target}', {'target': 't'})
+        self.assertEqual(
+            json.loads(json.dumps(self.router.to_state())),
+            json.loads(paths[0].read_text()),
+        )
+
+        # a different set of templates will have a different file.
+        self.router_class.from_strings_cached(['/'], cache_dir)
+        self.assertEqual(2, len(list(cache_dir.iterdir())))
+
+    def test_lazy(self):
+        self.router = self.router_class.from_strings([
+            '/',
+            '/e/{target}',
+            '/w/{target}',
+        ], lazy=True)
+        self.assertEqual([None, None, None], [
+            matcher._regex_pattern for matcher in self.router.matchers])
+        self.assertRouting('/', '/', {})
+        self.assertRouting('/w/t', '/w/{target}', {'target': 't'})
+        # the matcher for the static route is never compiled, nor the
+        # ones that are not required.
+        self.assertIsNone(self.router.matchers[0]._regex_pattern)
+        self.assertIsNone(self.router.static_matchers['/']._regex_pattern)
+
+        router = self.router_class.from_state(
+            self.router.to_state(), lazy=True)
+        self.assertEqual([None, None, None], [
+            matcher._regex_pattern for matcher in router.matchers])
+
+
+class CompiledURITemplateRouterTestCase(URITemplateRouterTestCase):
+
+    router_class = CompiledURITemplateRouter
+
+
+class PrefixTreeURITemplateRouterTestCase(URITemplateRouterTestCase):
+
+    router_class = PrefixTreeURITemplateRouter
+
+    def test_iter_matchers(self):
+        router = self.router_class.from_strings([
+            '/api/v1/repo/{id}',
+            '/api/v1/repo/{id}/view',
+            '/api/v1/user/{id}',
+            '/api/{version}/repo/{id}',
+            '{/path*}',
+        ])
+        self.assertEqual([
+            '/api/v1/repo/{id}',
+            '/api/v1/repo/{id}/view',
+            '/api/{version}/repo/{id}',
+            '{/path*}',
+        ], [
+            matcher.template.uri
+            for matcher in router.iter_matchers('/api/v1/repo/1')
+        ])
+        self.assertEqual([
+            '{/path*}',
+        ], [
+            matcher.template.uri
+            for matcher in router.iter_matchers('/elsewhere')
+        ])
+
+
+class StaticPrefixTreeTestCase(unittest.TestCase):
+
+    def test_empty(self):
+        tree = StaticPrefixTree()
+        self.assertEqual([], tree.find(''))
+        self.assertEqual([], tree.find('/'))
+
+    def test_prefixes(self):
+        tree = StaticPrefixTree()
+        tree.add('/api/v1/repo/', 1)
+        tree.add('/api/v1/user/', 2)
+        tree.add('/api/', 3)
+        tree.add('', 4)
+        tree.add('/api/v1/repo/', 5)
+        tree.add('/api/v2', 6)
+
+        self.assertEqual([4, 3, 1, 5], tree.find('/api/v1/repo/123'))
+        self.assertEqual([4, 3, 2], tree.find('/api/v1/user/123'))
+        self.assertEqual([4, 3], tree.find('/api/v1/'))
+        self.assertEqual([4, 3, 6], tree.find('/api/v2'))
+        self.assertEqual([4, 3], tree.find('/api/v'))
+        self.assertEqual([4], tree.find('/ap'))
+        self.assertEqual([4], tree.find(''))
+
+    def test_template_literal_prefix(self):
+        self.assertEqual('/api/v1/repo/', template_literal_prefix(
+            URITemplate('/api/v1/repo/{id}')))
+        self.assertEqual('/static', template_literal_prefix(
+            URITemplate('/static')))
+        self.assertEqual('', template_literal_prefix(
+            URITemplate('{/path*}')))
+        # regex metacharacters are not matched literally.
+        self.assertEqual('/file', template_literal_prefix(
+            URITemplate('/file.txt')))
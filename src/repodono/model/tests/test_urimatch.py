@@ -1,5 +1,7 @@
+import json
 import unittest
 import regex
+from timeit import Timer
 
 from uritemplate import URITemplate
 
@@ -7,6 +9,8 @@ from repodono.model.urimatch import template_to_regex_patternstr
 from repodono.model.urimatch import check_variable
 from repodono.model.urimatch import check_template_leading_slash
 from repodono.model.urimatch import match
+from repodono.model.urimatch import default_matcher_cache
+from repodono.model.urimatch import MatcherCache
 from repodono.model.urimatch import URITemplateMatcher
 
 
@@ -169,6 +173,45 @@ class UriMatchTestCase(unittest.TestCase):
             'root': 'value',
         }, result)
 
+    def test_default_cache(self):
+        template = URITemplate('/default_cache/{count}')
+        default_matcher_cache.evict(template.uri)
+        self.assertNotIn(template.uri, default_matcher_cache)
+        self.assertEqual({'count': '1'}, match(template, '/default_cache/1'))
+        self.assertIn(template.uri, default_matcher_cache)
+
+    def test_custom_cache(self):
+        cache = MatcherCache(maxsize=1)
+        first = URITemplate('/{count}')
+        second = URITemplate('/{count}/second')
+        self.assertEqual({'count': '1'}, match(first, '/1', cache=cache))
+        matcher = cache.get(first.uri)
+        self.assertTrue(isinstance(matcher, URITemplateMatcher))
+        self.assertEqual({'count': '2'}, match(first, '/2', cache=cache))
+        self.assertIs(matcher, cache.get(first.uri))
+        self.assertEqual(
+            {'count': '3'}, match(second, '/3/second', cache=cache))
+        # evicted due to size
+        self.assertNotIn(first.uri, cache)
+        self.assertEqual((3, 2, 1, 1), cache.info())
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+    def test_no_cache(self):
+        template = URITemplate('/no_cache/{count}')
+        default_matcher_cache.evict(template.uri)
+        self.assertEqual(
+            {'count': '1'}, match(template, '/no_cache/1', cache=None))
+        self.assertNotIn(template.uri, default_matcher_cache)
+
+    def test_cache_matcher_class(self):
+        class CustomMatcher(URITemplateMatcher):
+            pass
+
+        cache = MatcherCache(matcher_class=CustomMatcher)
+        self.assertTrue(isinstance(
+            cache.matcher(URITemplate('/{count}')), CustomMatcher))
+
 
 class URITemplateMatcherTestcase(unittest.TestCase):
 
@@ -176,6 +219,56 @@ class URITemplateMatcherTestcase(unittest.TestCase):
         static = URITemplateMatcher(URITemplate('/test'))
         self.assertEqual(static('/test'), {})
 
+    def test_matcher_map(self):
+        matcher = URITemplateMatcher(URITemplate('/{count}'))
+        self.assertEqual([
+            {'count': '1'},
+            None,
+            {'count': '2'},
+        ], list(matcher.map(['/1', '1', '/2'])))
+
+    def test_matcher_extractors(self):
+        matcher = URITemplateMatcher(
+            URITemplate('/{root}{/path*}/somewhere{?hello}'))
+        self.assertEqual((
+            ('root', 1, False),
+            ('path', 2, True),
+        ), matcher.extractors)
+
+    def test_matcher_state(self):
+        original = URITemplateMatcher(
+            URITemplate('/{root}{/path*}/somewhere{?hello}'))
+        matcher = URITemplateMatcher.from_state(
+            json.loads(json.dumps(original.to_state())))
+        self.assertEqual(original, matcher)
+        self.assertEqual(original.sort_key, matcher.sort_key)
+        self.assertEqual(original.extractors, matcher.extractors)
+        self.assertEqual(original.table, matcher.table)
+        self.assertEqual(original.variables, matcher.variables)
+        self.assertFalse(original < matcher)
+        self.assertFalse(matcher < original)
+        self.assertEqual(
+            {'root': 'r', 'path': ['a', 'b']}, matcher('/r/a/b/somewhere'))
+
+    def test_matcher_lazy(self):
+        matcher = URITemplateMatcher(URITemplate('/{root}{/path*}'), lazy=True)
+        self.assertIsNone(matcher._regex_pattern)
+        # sorting does not require the compiled pattern.
+        self.assertEqual(
+            [matcher], sorted([matcher, URITemplateMatcher(
+                URITemplate('/{root}{/path*}'), lazy=True)])[:1])
+        self.assertIsNone(matcher._regex_pattern)
+        self.assertEqual({'root': 'r', 'path': ['a']}, matcher('/r/a'))
+        self.assertIsNotNone(matcher._regex_pattern)
+
+    def test_matcher_state_lazy(self):
+        original = URITemplateMatcher(URITemplate('/{root}{/path*}'))
+        matcher = URITemplateMatcher.from_state(
+            json.loads(json.dumps(original.to_state())), lazy=True)
+        self.assertIsNone(matcher._regex_pattern)
+        self.assertEqual({'root': 'r', 'path': ['a']}, matcher('/r/a'))
+        self.assertIsNotNone(matcher._regex_pattern)
+
     def test_matcher_invalid(self):
         with self.assertRaises(ValueError):
             URITemplateMatcher(URITemplate('/{value}/{value}'))
@@ -191,6 +284,27 @@ class URITemplateMatcherTestcase(unittest.TestCase):
         self.assertEqual(first, second)
 
 
+class URITemplateMatcherBenchmarkTestcase(unittest.TestCase):
+
+    def test_match_overhead(self):
+        # guard the cost of extracting the variables from a match,
+        # relative to the cost of the underlying regex match.
+        matcher = URITemplateMatcher(
+            URITemplate('/root/{id}/{mode}{/path*}/view'))
+        uri = '/root/some_id/some_mode/a/nested/path/view'
+        pattern_match = matcher.regex_pattern.match
+
+        def raw():
+            pattern_match(uri)
+
+        def full():
+            matcher(uri)
+
+        raw_cost = min(Timer(raw).repeat(repeat=5, number=2000))
+        full_cost = min(Timer(full).repeat(repeat=5, number=2000))
+        self.assertLess(full_cost / raw_cost, 4)
+
+
 class URITemplateMatcherSortTestcase(unittest.TestCase):
 
     def assertSorted(self, templates):
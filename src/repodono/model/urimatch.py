@@ -1,8 +1,11 @@
 import regex
 from sys import maxsize
 from functools import partial
+from uritemplate import URITemplate
 from uritemplate.variable import URIVariable
 
+from repodono.model.cache import LRUCache
+
 
 nr_chars = regex.escape(URIVariable.reserved)
 
@@ -24,6 +27,17 @@ raw_operator_patterns = (
 static_splitter = regex.compile('{[^}]*}').split
 
 
+def to_tuple(value):
+    """
+    Recursively convert lists into tuples, such that values restored
+    from JSON may be compared against the original values.
+    """
+
+    if isinstance(value, list):
+        return tuple(to_tuple(item) for item in value)
+    return value
+
+
 def check_variable(variable):
     """
     Checks whether the provided URIVariable is supported by the variable
@@ -42,16 +56,20 @@ def check_variable(variable):
     return variable.variables[0][0]
 
 
-def default_pattern_finalizer(pattern_str, variable):
+def default_pattern_finalizer(pattern_str, variable, group_prefix=''):
     """
     Assumes the pattern string has a slot for the default token to name
     the group that provides the value matched for the name.
+
+    The group_prefix will be prepended to the name of the group, such
+    that patterns produced for different templates may be combined into
+    a single pattern without their group names colliding.
     """
 
     name = check_variable(variable)
 
     return name, pattern_str.format(
-        option='P<%s>' % name,
+        option='P<%s%s>' % (group_prefix, name),
         joiner=variable.operator,
         # for now ensure at least one value, if the value modifier is to
         # be supported it should be replaced with a specific max count?
@@ -276,8 +294,38 @@ class URITemplateMatcher(object):
     def build_sort_key(self):
         self._sort_key = self.compute_sort_key(self)
 
+    def build_extractors(self):
+        """
+        Build the tuple of extractors, which are 3-tuples of the name of
+        the variable, the index of the group and whether the variable is
+        exploded, for all variables that have a group in the pattern.
+        """
+
+        groupindex = self.regex_pattern.groupindex
+        # XXX TODO figure out how to deal with operators that are
+        # defined to be undefined/unused in this system, as they have
+        # no groups and thus are currently omitted.
+        self._extractors = tuple(
+            (variable, groupindex[variable], bool(details['explode']))
+            for variable, details in self.variables
+            if variable in groupindex
+        )
+
+    @property
+    def regex_pattern(self):
+        if self._regex_pattern is None:
+            self._regex_pattern = regex.compile(self.pattern_str)
+        return self._regex_pattern
+
+    @property
+    def extractors(self):
+        if self._extractors is None:
+            self.build_extractors()
+        return self._extractors
+
     def __init__(
-            self, template, template_converter=template_to_regex_patternstr):
+            self, template, template_converter=template_to_regex_patternstr,
+            lazy=False):
         """
         Arguments:
 
@@ -287,20 +335,62 @@ class URITemplateMatcher(object):
             A instance of template converter produced by the
             TemplateConverterFactory which will provide the methods
             required for the conversion.
+        lazy
+            If true, the compilation of the regex pattern will be
+            deferred until it is first required for matching.
         """
 
         self.template = template
         chunks = list(template_converter.iter_template(template))
         self.table = {
             name: orig for type_, name, orig, fragment in chunks if name}
-        self.regex_pattern = regex.compile(
-            template_converter.pattern_from_fragments(chunks))
+        self.pattern_str = template_converter.pattern_from_fragments(chunks)
+        self._regex_pattern = None
+        self._extractors = None
         # could use itertools.chain?
         self.variables = []
         for variable in self.template.variables:
             self.variables.extend(variable.variables)
+        if not lazy:
+            self.build_extractors()
+        # the sort key does not depend on the compiled pattern.
         self.build_sort_key()
 
+    def to_state(self):
+        """
+        Return a mapping of the state of this matcher that may be
+        serialized as JSON, from which an equivalent matcher may be
+        restored without going through the template converter.
+        """
+
+        return {
+            'uri': self.template.uri,
+            'pattern': self.pattern_str,
+            'table': self.table,
+            'variables': self.variables,
+            'extractors': self.extractors,
+            'sort_key': self.sort_key,
+        }
+
+    @classmethod
+    def from_state(cls, state, lazy=False):
+        """
+        Restore a matcher from the mapping produced by to_state, with
+        the compilation of the pattern deferred if lazy is true.
+        """
+
+        inst = cls.__new__(cls)
+        inst.template = URITemplate(state['uri'])
+        inst.table = dict(state['table'])
+        inst.pattern_str = state['pattern']
+        inst._regex_pattern = None if lazy else regex.compile(
+            inst.pattern_str)
+        inst.variables = [
+            (name, dict(details)) for name, details in state['variables']]
+        inst._extractors = to_tuple(state['extractors'])
+        inst._sort_key = to_tuple(state['sort_key'])
+        return inst
+
     def __lt__(self, other):
         if type(self) is type(other):
             return self.sort_key < other.sort_key
@@ -325,21 +415,63 @@ class URITemplateMatcher(object):
             return None
 
         results = {}
-        for variable, details in self.variables:
-            try:
-                if details['explode']:
-                    results[variable] = match.captures(variable)
-                else:
-                    results[variable] = match.group(variable)
-            except IndexError:
-                # XXX TODO figure out how to deal with operators that
-                # are defined to be undefined/unused in this system
-                continue
+        for variable, index, explode in self.extractors:
+            if explode:
+                results[variable] = match.captures(index)
+            else:
+                results[variable] = match.group(index)
 
         return results
 
+    def map(self, uris):
+        """
+        Match each of the uris, yielding the results in the same order.
+        """
+
+        return map(self, uris)
+
+
+class MatcherCache(LRUCache):
+    """
+    A bounded cache of matchers keyed by the uri of the template.
+    """
+
+    def __init__(self, maxsize=256, matcher_class=URITemplateMatcher, **kw):
+        """
+        Arguments:
+
+        maxsize
+            The maximum number of matchers to be kept by the cache.
+        matcher_class
+            The class that will be used to construct the matchers.
+        """
+
+        super().__init__(maxsize=maxsize, **kw)
+        self.matcher_class = matcher_class
+
+    def matcher(self, template):
+        """
+        Return the matcher for the template, constructing and caching
+        one if it is not already cached.
+        """
+
+        matcher = self.get(template.uri)
+        if matcher is None:
+            matcher = self.matcher_class(template)
+            self[template.uri] = matcher
+        return matcher
+
+
+default_matcher_cache = MatcherCache()
+
+
+def match(template, uri, cache=default_matcher_cache):
+    """
+    Match the uri against the template, using the matcher from the
+    provided cache.  If cache is None, a new matcher will be constructed
+    for this call.
+    """
 
-def match(template, uri, __cache={}):
-    if template.uri not in __cache:
-        __cache[template.uri] = URITemplateMatcher(template)
-    return __cache[template.uri](uri)
+    if cache is None:
+        return URITemplateMatcher(template)(uri)
+    return cache.matcher(template)(uri)